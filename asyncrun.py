@@ -0,0 +1,122 @@
+"""
+asyncio front end for main.py: run_async evaluates on the VM a chunk of
+instructions at a time, yielding to the event loop between chunks.
+
+    value, error = await run_async('<request>', text, symbol_table=table)
+"""
+import asyncio
+import threading
+
+import main
+
+# Instructions evaluated between two yields to the event loop
+DEFAULT_CHUNK = 1000
+
+
+class CancelError(main.RTError):
+	def __init__(self, pos_start, pos_end, context):
+		super().__init__(pos_start, pos_end, 'Evaluation was cancelled', context)
+		self.error_name = 'Cancelled'
+
+
+# main.VM step hook that pauses every chunk instructions and meters each one if given a Meter
+class Chunker:
+	def __init__(self, chunk=DEFAULT_CHUNK, meter=None):
+		if chunk < 1:
+			raise Exception('chunk must be at least 1')
+		self.chunk = chunk
+		self.meter = meter
+		self.count = 0
+
+	def __call__(self, code, pc, op, stack, context):
+		# A resumed run calls the hook again for the paused instruction,
+		# which then starts the next chunk
+		if self.count == self.chunk:
+			self.count = 0
+			return main.PAUSE
+		self.count += 1
+		if self.meter is None: return None
+		return self.meter.vm_step(code, pc, op, stack, context)
+
+
+def make_vm(chunk, budget):
+	return main.VM(Chunker(chunk, None if budget is None else main.Meter(budget)))
+
+
+def cancelled(paused):
+	node = paused.code.nodes[paused.pc]
+	return main.RTResult().failure(CancelError(node.pos_start, node.pos_end, paused.context))
+
+
+def prepare(fn, text, lexer, optimize, cache, symbol_table, parser):
+	# The front end of main.run: returns (code, context, None) or (None, None, error)
+	if lexer not in main.LEXERS:
+		raise Exception(f"Unknown lexer '{lexer}'")
+	if parser not in main.PARSERS:
+		raise Exception(f"Unknown parser '{parser}'")
+
+	if cache:
+		program = main.program_cache.load(fn, text, lexer, optimize, parser)
+	else:
+		program = main.parse_program(fn, text, lexer, parser)
+	if program.error: return None, None, program.error
+
+	code = program.executable('vm', optimize)
+	context = main.Context('<program>')
+	context.symbol_table = main.global_symbol_table if symbol_table is None else symbol_table
+	return code, context, None
+
+
+def stopped(events):
+	return any(event.is_set() for event in events)
+
+
+def run_in_thread(args, chunk, budget, events):
+	# Evaluates on an executor thread, looking at the events between chunks
+	code, context, error = prepare(*args)
+	if error: return None, error
+
+	vm = make_vm(chunk, budget)
+	result = vm.run(code, context)
+	while isinstance(result, main.Paused):
+		if stopped(events):
+			result = cancelled(result)
+			break
+		result = vm.resume(result)
+	return result.value, result.error
+
+
+# main.run for coroutines, on the VM, yielding to the event loop every chunk
+# instructions; setting cancel returns a CancelError, cancelling the task re-raises
+async def run_async(fn, text, lexer='regex', optimize=False, cache=True, symbol_table=None, parser='pratt',
+		chunk=DEFAULT_CHUNK, executor=None, budget=None, cancel=None):
+	if chunk < 1:
+		raise Exception('chunk must be at least 1')
+	args = (fn, text, lexer, optimize, cache, symbol_table, parser)
+	stop = threading.Event()
+	events = (stop,) if cancel is None else (stop, cancel)
+
+	if executor is not None:
+		loop = asyncio.get_running_loop()
+		future = loop.run_in_executor(None if executor is True else executor, run_in_thread, args, chunk, budget, events)
+		try:
+			return await asyncio.shield(future)
+		except asyncio.CancelledError:
+			# The worker thread cannot be interrupted, so wait until it stops
+			stop.set()
+			await future
+			raise
+
+	code, context, error = prepare(*args)
+	if error: return None, error
+
+	vm = make_vm(chunk, budget)
+	result = vm.run(code, context)
+	while isinstance(result, main.Paused):
+		if stopped(events):
+			result = cancelled(result)
+			break
+		# A cancelled task raises here, which leaves the run paused for good
+		await asyncio.sleep(0)
+		result = vm.resume(result)
+	return result.value, result.error
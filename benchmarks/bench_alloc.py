@@ -0,0 +1,65 @@
+"""
+Wrapper allocations during evaluation: runs the bench_engines corpus with
+every engine in main.ENGINES and counts how many Number, RTResult and
+Position objects are created per evaluated AST node, next to evals/s.
+Counting wraps the classes' __init__, so rates here are lower than in
+bench_engines.
+
+    python benchmarks/bench_alloc.py [formulas] [rounds]
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_engines import generate, make_context, parse
+from bench_memory import count_nodes
+import main
+
+COUNTED = ('Number', 'RTResult', 'Position')
+
+@contextmanager
+def counting(counts):
+	saved = []
+	for name in COUNTED:
+		cls = getattr(main, name)
+		init = cls.__init__
+
+		def counted_init(self, *args, init=init, name=name):
+			counts[name] += 1
+			init(self, *args)
+
+		saved.append((cls, init))
+		cls.__init__ = counted_init
+	try:
+		yield
+	finally:
+		for cls, init in saved:
+			cls.__init__ = init
+
+def bench(engine, nodes, rounds):
+	compile_, execute = main.ENGINES[engine]
+	programs = [compile_(node) for node in nodes]
+	context = make_context()
+	counts = dict.fromkeys(COUNTED, 0)
+	with counting(counts):
+		start = time.perf_counter()
+		for _ in range(rounds):
+			for program in programs:
+				execute(program, context)
+		elapsed = time.perf_counter() - start
+	return counts, len(programs) * rounds / elapsed
+
+def report(count=500, rounds=10, engines=None):
+	nodes = [parse(text) for text in generate(count)]
+	evaluated = sum(count_nodes(node) for node in nodes) * rounds
+	print(f'corpus: {count} formulas x {rounds} rounds, {evaluated} nodes evaluated')
+	print(f'{"":>8}  {"Number":>8} {"RTResult":>8} {"Position":>8}  per node')
+	for engine in engines or main.ENGINES:
+		counts, rate = bench(engine, nodes, rounds)
+		per_node = '  '.join(f'{counts[name] / evaluated:7.3f}' for name in COUNTED)
+		print(f'{engine:>8}: {per_node}   {rate:10,.0f} evals/s')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,63 @@
+"""
+Repeated subexpressions: generates formulas built from a few subexpressions
+that each occur several times, like (price*qty+fee), and reports AST size
+as a tree and as the main.HashConser DAG a hash-consing ProgramCache keeps,
+and evaluations per second with the tree walker, the 'cse' engine and the
+VM.
+
+    python benchmarks/bench_cse.py [formulas] [rounds] [repeats]
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_engines import NAMES, bench, parse
+from bench_memory import count_nodes
+import main
+
+def generate(count, repeats=12, seed=0):
+	rng = random.Random(seed)
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.25:
+			return rng.choice(NAMES) if rng.random() < 0.7 else str(rng.randint(1, 100))
+		return f'({expr(depth - 1)} {rng.choice("+-*+*")} {expr(depth - 1)})'
+
+	formulas = []
+	for _ in range(count):
+		parts = [expr(3) for _ in range(3)]
+		terms = [rng.choice(parts) for _ in range(repeats)]
+		formulas.append(' + '.join(terms))
+	return formulas
+
+def count_dag(node):
+	seen = set()
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if id(node) in seen: continue
+		seen.add(id(node))
+		for attr in ('left_node', 'right_node', 'node', 'value_node'):
+			child = getattr(node, attr, None)
+			if child is not None: stack.append(child)
+	return len(seen)
+
+def report(count=500, rounds=20, repeats=12):
+	nodes = [parse(text) for text in generate(count, repeats)]
+	dags = [main.HashConser(keep_spans=True).build(node) for node in nodes]
+
+	tree_nodes = sum(count_nodes(node) for node in nodes)
+	dag_nodes = sum(count_dag(node) for node in dags)
+	tree_bytes = sum(main.sizeof_tree(node) for node in nodes)
+	dag_bytes = sum(main.sizeof_tree(node) for node in dags)
+	print(f'corpus: {count} formulas of {repeats} terms x {rounds} rounds')
+	print(f'  tree: {tree_nodes:8} nodes {tree_bytes / 1024:8.0f} KB')
+	print(f'  dag:  {dag_nodes:8} nodes {dag_bytes / 1024:8.0f} KB')
+
+	for engine in ('tree', 'cse', 'vm'):
+		rate, errors = bench(engine, nodes, rounds)
+		print(f'{engine:>6}: {rate:10,.0f} evals/s  ({errors} errors)')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:4]])
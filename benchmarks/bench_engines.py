@@ -0,0 +1,69 @@
+"""
+Evaluation throughput of every engine in main.ENGINES: each formula of a
+generated corpus is compiled once per engine and then evaluated repeatedly
+against a bound symbol table. Reports evaluations per second.
+
+    python benchmarks/bench_engines.py [formulas] [rounds]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import main
+
+NAMES = ['price', 'qty', 'rate', 'tax', 'fee', 'base']
+
+def generate(count, seed=0):
+	rng = random.Random(seed)
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.25:
+			k = rng.random()
+			if k < 0.3: return str(rng.randint(1, 100))
+			if k < 0.45: return f'{rng.randint(1, 99)}.{rng.randint(0, 99)}'
+			return rng.choice(NAMES)
+		if rng.random() < 0.1: return '-' + expr(depth - 1)
+		op = rng.choice('+-*/+*')
+		if rng.random() < 0.1: return f'({expr(depth - 1)}) ^ 2'
+		return f'({expr(depth - 1)} {op} {expr(depth - 1)})'
+
+	return [expr(5) for _ in range(count)]
+
+def make_context():
+	symbol_table = main.SymbolTable()
+	for i, name in enumerate(NAMES):
+		symbol_table.set(name, main.Number(1.5 + i))
+	context = main.Context('<bench>')
+	context.symbol_table = symbol_table
+	return context
+
+def parse(text):
+	tokens, error = main.RegexLexer('<bench>', text).make_tokens()
+	if error: raise Exception(error.as_string())
+	ast = main.Parser(tokens).parse()
+	if ast.error: raise Exception(ast.error.as_string())
+	return ast.node
+
+def bench(engine, nodes, rounds):
+	compile_, execute = main.ENGINES[engine]
+	programs = [compile_(node) for node in nodes]
+	context = make_context()
+	errors = 0
+	start = time.perf_counter()
+	for _ in range(rounds):
+		for program in programs:
+			if execute(program, context).error: errors += 1
+	elapsed = time.perf_counter() - start
+	return len(programs) * rounds / elapsed, errors
+
+def report(count=500, rounds=20, engines=None):
+	nodes = [parse(text) for text in generate(count)]
+	print(f'corpus: {count} formulas x {rounds} rounds')
+	for engine in engines or main.ENGINES:
+		rate, errors = bench(engine, nodes, rounds)
+		print(f'{engine:>8}: {rate:12,.0f} evals/s  ({errors} runtime errors)')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:3]])
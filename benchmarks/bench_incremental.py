@@ -0,0 +1,48 @@
+"""
+Edit latency of incremental.Document on a large buffer: replays single
+keystrokes at random places (typing a digit, deleting a character, breaking
+and joining lines) and reports microseconds per edit, next to the time of a
+full lex and parse of the same buffer.
+
+    python benchmarks/bench_incremental.py [lines] [edits]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import incremental
+from bench_engines import generate
+
+def make_edits(doc, count, seed=0):
+	# Edits are generated against the document as it changes
+	rng = random.Random(seed)
+	for _ in range(count):
+		size = len(doc)
+		offset = rng.randint(0, size)
+		k = rng.random()
+		if k < 0.6: yield 'type', (offset, 0, str(rng.randint(0, 9)))
+		elif k < 0.85 and offset < size: yield 'delete', (offset, 1, '')
+		elif k < 0.95: yield 'newline', (offset, 0, '\n')
+		else: yield 'paste', (offset, 0, 'VAR pasted = 1; pasted * 2\n')
+
+def report(lines=5000, edits=2000):
+	text = '\n'.join(f'VAR v{i} = {formula}' for i, formula in enumerate(generate(lines)))
+	start = time.perf_counter()
+	doc = incremental.Document('<bench>', text)
+	full = time.perf_counter() - start
+	print(f'buffer: {lines} lines, {len(text)} chars; full lex + parse {full * 1e3:.1f} ms')
+
+	times = {}
+	for kind, edit in make_edits(doc, edits):
+		start = time.perf_counter()
+		doc.edit(*edit)
+		times.setdefault(kind, []).append(time.perf_counter() - start)
+	for kind, samples in times.items():
+		samples.sort()
+		mean = sum(samples) / len(samples)
+		print(f'{kind:>8}: {mean * 1e6:8.1f} us mean  {samples[len(samples) // 2] * 1e6:8.1f} us median  {samples[-1] * 1e6:8.1f} us max  ({len(samples)} edits)')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:3]])
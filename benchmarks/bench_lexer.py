@@ -0,0 +1,49 @@
+"""
+Lexer throughput: tokenizes one large generated expression with every lexer
+in main.LEXERS and reports MB/s.
+
+    python benchmarks/bench_lexer.py [size_mb] [repeat]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import main
+
+def generate(size, seed=0):
+	rng = random.Random(seed)
+	names = ['x', 'rate', 'total_2', 'Alpha', 'b']
+	parts = []
+	length = 0
+	while length < size:
+		k = rng.random()
+		if k < 0.4: atom = str(rng.randint(0, 10000))
+		elif k < 0.6: atom = f'{rng.randint(0, 999)}.{rng.randint(0, 99)}'
+		else: atom = rng.choice(names)
+		part = f'{rng.choice("+-*/^")} ({atom} {rng.choice("+-*/")}\t{atom}) '
+		parts.append(part)
+		length += len(part)
+	return '1 ' + ''.join(parts)
+
+def bench(cls, text, repeat):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		tokens, error = cls('<bench>', text).make_tokens()
+		elapsed = time.perf_counter() - start
+		if error: raise Exception(error.as_string())
+		best = elapsed if best is None else min(best, elapsed)
+	return best, len(tokens)
+
+def report(size_mb=4, repeat=3):
+	text = generate(int(size_mb * 1024 * 1024))
+	mb = len(text) / (1024 * 1024)
+	print(f'input: {mb:.2f} MB')
+	for name, cls in main.LEXERS.items():
+		elapsed, count = bench(cls, text, repeat)
+		print(f'{name:>8}: {mb / elapsed:8.2f} MB/s  {count / elapsed / 1e6:6.2f} Mtok/s  ({count} tokens)')
+
+if __name__ == '__main__':
+	report(*[float(a) for a in sys.argv[1:2]], *[int(a) for a in sys.argv[2:3]])
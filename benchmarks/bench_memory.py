@@ -0,0 +1,110 @@
+"""
+Resident memory of lexed and parsed expressions: keeps the tokens and ASTs of
+a large generated corpus alive and reports bytes per token and per node, for
+both main.py and groupscode/. "dict" rebuilds the old layout by swapping in
+subclasses of the slotted classes that carry a per-instance __dict__ again.
+
+    python benchmarks/bench_memory.py [expressions]
+"""
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'groupscode'))
+import main
+import AST
+import lexer
+import parser
+
+def generate(count, seed=0):
+	rng = random.Random(seed)
+	names = [f'v{i}' for i in range(50)]
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.3:
+			k = rng.random()
+			if k < 0.4: return str(rng.randint(0, 1000))
+			if k < 0.6: return f'{rng.randint(0, 99)}.{rng.randint(0, 99)}'
+			return rng.choice(names)
+		if rng.random() < 0.1: return '-' + expr(depth - 1)
+		return f'({expr(depth - 1)} {rng.choice("+-*/")} {expr(depth - 1)})'
+
+	return [f'VAR {rng.choice(names)} = {expr(4)}' for _ in range(count)]
+
+def count_nodes(node):
+	count = 0
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		count += 1
+		for attr in ('left_node', 'right_node', 'node', 'value_node'):
+			child = getattr(node, attr, None)
+			if child is not None: stack.append(child)
+	return count
+
+@contextmanager
+def dict_backed(patches):
+	saved = []
+	for module, name in patches:
+		cls = getattr(module, name)
+		saved.append((module, name, cls))
+		setattr(module, name, type(name, (cls,), {}))
+	try:
+		yield
+	finally:
+		for module, name, cls in saved:
+			setattr(module, name, cls)
+
+def traced(func):
+	gc.collect()
+	tracemalloc.start()
+	result = func()
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return result, size
+
+def measure(corpus, lex, parse):
+	token_lists, token_bytes = traced(lambda: [lex(text) for text in corpus])
+	asts, node_bytes = traced(lambda: [parse(tokens) for tokens in token_lists])
+	tokens = sum(len(t) for t in token_lists)
+	nodes = sum(count_nodes(n) for n in asts)
+	return token_bytes / tokens, node_bytes / nodes, tokens, nodes
+
+IMPLEMENTATIONS = {
+	'main': (
+		lambda text: main.RegexLexer('<bench>', text).make_tokens()[0],
+		lambda tokens: main.Parser(tokens).parse().node,
+		[(main, name) for name in (
+			'Source', 'Position', 'Token', 'NumberNode', 'VarAccessNode',
+			'VarAssignNode', 'BinOpNode', 'UnaryOpNode', 'ParseResult'
+		)],
+	),
+	'groupscode': (
+		lambda text: lexer.Lex('<bench>', text).make_tokens()[0],
+		lambda tokens: parser.Parser(tokens).parse().node,
+		[(lexer, 'Position'), (lexer, 'Token'), (parser, 'ParseResult')] + [
+			(AST, name) for name in (
+				'NumberNode', 'VarAccessNode', 'VarAssignNode', 'BinOpNode', 'UnaryOpNode'
+			)
+		],
+	),
+}
+
+def report(count=20000):
+	corpus = generate(count)
+	print(f'corpus: {count} expressions, {sum(map(len, corpus)) / 1024:.0f} KB')
+	for name, (lex, parse, patches) in IMPLEMENTATIONS.items():
+		with dict_backed(patches):
+			before = measure(corpus, lex, parse)
+		after = measure(corpus, lex, parse)
+		print(f'{name} ({after[2]} tokens, {after[3]} nodes)')
+		print(f'  bytes/token: dict {before[0]:7.1f}   slots {after[0]:7.1f}')
+		print(f'  bytes/node:  dict {before[1]:7.1f}   slots {after[1]:7.1f}')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:2]])
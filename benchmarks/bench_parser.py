@@ -0,0 +1,57 @@
+"""
+Parser throughput: parses a generated formula corpus with every parser in
+main.PARSERS from pre-lexed tokens, and reports formulas and tokens per
+second. A final row checks how deep parenthesized input each parser takes.
+
+    python benchmarks/bench_parser.py [formulas] [repeat]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import main
+from bench_engines import generate
+
+def tokenize(texts):
+	token_lists = []
+	for text in texts:
+		tokens, error = main.RegexLexer('<bench>', text).make_tokens()
+		if error: raise Exception(error.as_string())
+		token_lists.append(tokens)
+	return token_lists
+
+def bench(cls, token_lists, repeat):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for tokens in token_lists:
+			if cls(tokens).parse().error: raise Exception('parse error in corpus')
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def max_depth(cls, limit=1000000):
+	# Doubles the nesting of ((...(1)...)) until the parser gives up
+	depth = 1
+	while depth <= limit:
+		tokens, _ = main.RegexLexer('<bench>', '(' * depth + '1' + ')' * depth).make_tokens()
+		try:
+			if cls(tokens).parse().error: break
+		except RecursionError:
+			break
+		depth *= 2
+	return depth // 2
+
+def report(count=5000, repeat=3):
+	token_lists = tokenize(generate(count))
+	total = sum(len(tokens) for tokens in token_lists)
+	print(f'input: {count} formulas, {total} tokens')
+	for name, cls in main.PARSERS.items():
+		elapsed = bench(cls, token_lists, repeat)
+		print(f'{name:>10}: {count / elapsed:10.0f} formulas/s  {total / elapsed / 1e6:6.2f} Mtok/s')
+	for name, cls in main.PARSERS.items():
+		print(f'{name:>10}: nesting depth >= {max_depth(cls)}')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,69 @@
+"""
+Script execution: generates a script of one statement per line and runs it
+with main.run_program in this process and through `shell.py FILE` in a
+child process. For comparison, a sample of lines is run the old way, one
+`shell.py` process per line, and extrapolated to the whole script.
+
+    python benchmarks/bench_script.py [lines] [sampled_processes]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import main
+from bench_engines import NAMES, generate, make_context
+
+def make_script(lines):
+	# Inputs are bound the way bench_engines binds them, and formulas that
+	# fail with those values are left out
+	header = [f'VAR {name} = {i + 1.5}' for i, name in enumerate(NAMES)]
+	context = make_context()
+	formulas = [text for text in generate(2000) if not main.run('<bench>', text, symbol_table=context.symbol_table)[1]]
+	body = [f'VAR result = {formulas[i % len(formulas)]} // line {i}' for i in range(lines)]
+	return '\n'.join(header + body) + '\n', header
+
+def run_in_process(text):
+	start = time.perf_counter()
+	count = 0
+	for value, error in main.run_program('<bench>', text):
+		if error: raise Exception(error.as_string())
+		count += 1
+	return count, time.perf_counter() - start
+
+def run_shell(path):
+	start = time.perf_counter()
+	subprocess.run([sys.executable, os.path.join(ROOT, 'shell.py'), path], check=True, stdout=subprocess.DEVNULL)
+	return time.perf_counter() - start
+
+def run_per_line(header, lines):
+	# Each line gets its own process, with the variables it reads defined first
+	start = time.perf_counter()
+	for line in lines:
+		script = '\n'.join(header + [line])
+		subprocess.run([sys.executable, os.path.join(ROOT, 'shell.py')], input=script, text=True, check=True, stdout=subprocess.DEVNULL)
+	return (time.perf_counter() - start) / len(lines)
+
+def report(lines=1000000, sampled=10):
+	text, header = make_script(lines)
+	print(f'script: {lines} lines, {len(text) / 1e6:.1f} MB')
+
+	count, elapsed = run_in_process(text)
+	print(f'  run_program: {elapsed:8.2f} s  {count / elapsed:10,.0f} statements/s')
+
+	with tempfile.NamedTemporaryFile('w', suffix='.ml', delete=False) as f:
+		f.write(text)
+	try:
+		elapsed = run_shell(f.name)
+	finally:
+		os.unlink(f.name)
+	print(f'  shell.py FILE: {elapsed:6.2f} s  {count / elapsed:10,.0f} statements/s')
+
+	per_line = run_per_line(header, text.splitlines()[len(header):len(header) + sampled])
+	print(f'  one process per line: {per_line * 1e3:.1f} ms/line, about {per_line * lines:,.0f} s for the script')
+
+if __name__ == '__main__':
+	report(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,143 @@
+"""
+Engine agreement: runs formulas on every engine in main.ENGINES, with and
+without optimize, and reports each one whose value, or error name, details
+and span, differs from the tree walker's. Formulas are the REGRESSIONS
+below followed by a generated corpus. The 'tiered' engine is also run on
+the REGRESSIONS and the first TIERED of the corpus past TIER_RUNS runs,
+and must give the same outcome before and after compiling the program.
+Every engine is then run again on programs from a hash-consing
+ProgramCache. Exits non-zero on a mismatch.
+
+    python benchmarks/check_engines.py [formulas] [seed]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import main
+
+BINDINGS = {'x': 2, 'y': 3, 'z': 0, 'r': 1.5}
+# Corpus formulas also checked across the tiered engine's promotion
+TIERED = 50
+# Runs before the tiered engine compiles a program
+TIER_RUNS = 20
+
+# Formulas an engine once got wrong
+REGRESSIONS = [
+	# A folded negative base compiled to -2 ** x, which Python reads as -(2 ** x)
+	'(-2) ^ x',
+	'(0 - 3) ^ x',
+	'(0 - 0.0) ^ y',
+	'x ^ (-1)',
+	# The cse engine reported errors in a repeated subexpression at its first occurrence
+	'x;VAR y = +-z;(((null * (3 * 0)) / y) - ((VAR y = (z / null)) - 1))',
+	'(x / z) + (x / z)',
+	'VAR q = x / y;VAR y = 0;(x / y) + q',
+	'undefined + (2 * undefined)',
+	# Hash-consed programs reported errors in a repeated divisor at its first occurrence
+	'0 + (x / 0)',
+	'VAR a = 2;(1 / (a - 1)) + 0;VAR a = 1;(1 / (a - 1))',
+	'(x / (y - 3)) + ((x / (y - 3)) * 0)',
+	'(2 * undefined) + (VAR undefined = 1) + (2 * undefined)',
+]
+
+def generate(count, seed=0):
+	rng = random.Random(seed)
+	names = list(BINDINGS) + ['undefined']
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.2:
+			k = rng.random()
+			if k < 0.35: return str(rng.randint(0, 5))
+			if k < 0.45: return f'{rng.randint(0, 5)}.5'
+			if k < 0.5: return 'null'
+			return rng.choice(names[:-1]) if rng.random() < 0.95 else names[-1]
+		k = rng.random()
+		if k < 0.1: return f'-{expr(depth - 1)}'
+		if k < 0.2: return f'(0 - {rng.randint(1, 5)})'
+		if k < 0.3: return f'({expr(depth - 1)}) ^ {rng.randint(0, 3)}'
+		if k < 0.35: return f'(VAR {rng.choice(names[:-1])} = {expr(depth - 1)})'
+		return f'({expr(depth - 1)} {rng.choice("+-*/")} {expr(depth - 1)})'
+
+	return [';'.join(expr(4) for _ in range(rng.randint(1, 3))) for _ in range(count)]
+
+def outcome(value, error):
+	if error:
+		return (error.error_name, error.details, error.pos_start.idx, error.pos_end.idx)
+	return (repr(value.value),)
+
+def evaluate(text, engine, optimize):
+	symbol_table = main.make_symbol_table(BINDINGS)
+	return outcome(*main.run('<check>', text, engine, optimize=optimize, cache=False, symbol_table=symbol_table))
+
+def check(texts):
+	mismatches = 0
+	for text in texts:
+		for optimize in (False, True):
+			expected = evaluate(text, 'tree', optimize)
+			for engine in main.ENGINES:
+				got = evaluate(text, engine, optimize)
+				if got != expected:
+					mismatches += 1
+					print(f'{engine} optimize={optimize}: {text!r}\n  expected {expected}\n       got {got}')
+	return mismatches
+
+def check_hashcons(texts):
+	# Every engine, on programs from a hash-consing cache, against the tree walker on plain ASTs
+	cache = main.program_cache
+	main.program_cache = main.ProgramCache(hashcons=True)
+	mismatches = 0
+	try:
+		for text in texts:
+			for optimize in (False, True):
+				expected = evaluate(text, 'tree', optimize)
+				for engine in main.ENGINES:
+					symbol_table = main.make_symbol_table(BINDINGS)
+					got = outcome(*main.Engine(engine, optimize=optimize).run('<check>', text, symbol_table))
+					if got != expected:
+						mismatches += 1
+						print(f'{engine} optimize={optimize} hashcons: {text!r}\n  expected {expected}\n       got {got}')
+	finally:
+		main.program_cache = cache
+	return mismatches
+
+def run_tiered(engine, text):
+	symbol_table = main.make_symbol_table(BINDINGS)
+	return outcome(*engine.run('<check>', text, symbol_table))
+
+def check_tiers(texts):
+	# Runs each program past TIER_RUNS, then again once it is compiled
+	mismatches = 0
+	for text in texts:
+		for optimize in (False, True):
+			engine = main.Engine('tiered', optimize=optimize, tier_threshold=TIER_RUNS)
+			expected = evaluate(text, 'tree', optimize)
+			before = [run_tiered(engine, text) for _ in range(TIER_RUNS)]
+			code = main.program_cache.get('<check>', text).compiled[('tiered', optimize)]
+			while code.tier == 'compiling':
+				time.sleep(0.001)
+			after = run_tiered(engine, text)
+
+			if code.tier != 'compiled' or any(got != expected for got in before) or after != expected:
+				mismatches += 1
+				print(f'tiered optimize={optimize} ({code.tier}): {text!r}\n  expected {expected}\n    before {before[-1]}\n     after {after}')
+	return mismatches
+
+def report(count=2000, seed=0):
+	corpus = generate(count, seed)
+	texts = REGRESSIONS + corpus
+	mismatches = check(texts)
+	print(f'{len(texts)} formulas x {len(main.ENGINES)} engines: {mismatches} mismatches')
+
+	tiered = REGRESSIONS + corpus[:TIERED]
+	tier_mismatches = check_tiers(tiered)
+	print(f'{len(tiered)} formulas across tiered promotion: {tier_mismatches} mismatches')
+
+	hashcons_mismatches = check_hashcons(texts)
+	print(f'{len(texts)} formulas x {len(main.ENGINES)} engines, hash-consed: {hashcons_mismatches} mismatches')
+	return 1 if mismatches or tier_mismatches or hashcons_mismatches else 0
+
+if __name__ == '__main__':
+	sys.exit(report(*[int(a) for a in sys.argv[1:3]]))
@@ -0,0 +1,70 @@
+"""
+Reproducible MiniLang corpora. The same seed and settings always give the
+same programs, so timings from different runs and machines compare the same
+work.
+
+    programs = generate(seed=1, programs=500, statements=4, depth=5)
+    prelude(identifiers=8)   # binds every name the programs read
+
+A program is a list of statement strings; '\\n'.join(program) is its text
+for main.py. Leaves are int literals, float literals or identifiers mixed by
+the given weights, nesting is the largest number of redundant parentheses
+put around an operand, and assign is the share of statements that are
+VAR assignments to one of the identifiers. groupscode/ has no '^', so keep
+it out of operators when its implementation is measured.
+"""
+import random
+
+DEFAULTS = {
+	'seed': 0,
+	'programs': 1000,
+	'statements': 1,
+	'depth': 4,
+	'identifiers': 6,
+	'ints': 3,
+	'floats': 1,
+	'names': 4,
+	'nesting': 1,
+	'assign': 0.3,
+	'operators': '+-*/',
+}
+
+def names(identifiers):
+	return [f'v{i}' for i in range(identifiers)]
+
+def prelude(identifiers=DEFAULTS['identifiers']):
+	# Statements binding every identifier, none of them to zero
+	return [f'VAR {name} = {i + 1}.5' for i, name in enumerate(names(identifiers))]
+
+def generate(**settings):
+	unknown = set(settings) - set(DEFAULTS)
+	if unknown: raise Exception(f'Unknown corpus settings: {", ".join(sorted(unknown))}')
+	config = dict(DEFAULTS, **settings)
+
+	rng = random.Random(config['seed'])
+	identifiers = names(config['identifiers'])
+	leaf_kinds = ['int', 'float', 'name']
+	leaf_weights = [config['ints'], config['floats'], config['names']]
+
+	def leaf():
+		kind = rng.choices(leaf_kinds, leaf_weights)[0]
+		if kind == 'int': return str(rng.randint(1, 1000))
+		if kind == 'float': return f'{rng.randint(0, 999)}.{rng.randint(0, 99)}'
+		return rng.choice(identifiers)
+
+	def wrap(text):
+		levels = rng.randint(0, config['nesting'])
+		return '(' * levels + text + ')' * levels
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.2: return wrap(leaf())
+		if rng.random() < 0.1: return '-' + wrap(expr(depth - 1))
+		op = rng.choice(config['operators'])
+		return f'({expr(depth - 1)} {op} {expr(depth - 1)})'
+
+	def statement():
+		text = expr(config['depth'])
+		if rng.random() < config['assign']: return f'VAR {rng.choice(identifiers)} = {text}'
+		return text
+
+	return [[statement() for _ in range(config['statements'])] for _ in range(config['programs'])]
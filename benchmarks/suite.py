@@ -0,0 +1,245 @@
+"""
+Benchmark suite: times lexing, parsing and evaluation separately, and the
+three together end to end, on a generated corpus (see benchmarks.corpus),
+for each implementation:
+
+- main: main.Lexer, main.Parser and main.Interpreter, like for like with
+  groupscode; 'run' is main.run() with its defaults and no program cache;
+- main-fast: main.RegexLexer, main.PrattParser and the 'vm' engine;
+- groupscode: groupscode/'s Lex, Parser and Interpreter, which take one
+  statement at a time.
+
+Every phase is repeated and the best time kept. Results can be written to
+JSON and compared with an earlier file, which exits non-zero when a phase
+got slower than the threshold allows.
+
+    python benchmarks/suite.py --out base.json
+    python benchmarks/suite.py --compare base.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+GROUPSCODE = os.path.join(ROOT, 'groupscode')
+sys.path.insert(0, ROOT)
+import main
+import corpus
+
+PHASES = ('lex', 'parse', 'evaluate', 'run')
+
+class Implementation:
+	# texts turns a corpus program (a list of statements) into the texts
+	# this implementation is given one at a time
+	def texts(self, program):
+		return ['\n'.join(program)]
+
+class Main(Implementation):
+	def lex(self, text):
+		return main.Lexer('<bench>', text).make_tokens()
+
+	def parse(self, tokens):
+		ast = main.Parser(tokens).parse()
+		return ast.node, ast.error
+
+	def context(self, prelude):
+		symbol_table = main.make_symbol_table()
+		main.run('<prelude>', '\n'.join(prelude), engine='tree', cache=False, symbol_table=symbol_table)
+		context = main.Context('<program>')
+		context.symbol_table = symbol_table
+		return context
+
+	def evaluate(self, node, context):
+		result = main.Interpreter().visit(node, context)
+		return result.value, result.error
+
+	def run(self, text, context):
+		return main.run('<bench>', text, cache=False, symbol_table=context.symbol_table)
+
+class MainFast(Main):
+	def lex(self, text):
+		return main.RegexLexer('<bench>', text).make_tokens()
+
+	def parse(self, tokens):
+		ast = main.PrattParser(tokens).parse()
+		return ast.node, ast.error
+
+	def evaluate(self, node, context):
+		result = main.exec_vm(main.compile_vm(node), context)
+		return result.value, result.error
+
+	def run(self, text, context):
+		return main.run('<bench>', text, engine='vm', lexer='regex', parser='pratt', cache=False, symbol_table=context.symbol_table)
+
+class Groupscode(Implementation):
+	def __init__(self):
+		# groupscode/ imports its modules by bare name; the empty lexer.py
+		# and parser.py at the root must not shadow them
+		sys.path.insert(0, GROUPSCODE)
+		for name in ('lexer', 'parser', 'AST', 'errors', 'interpreter'):
+			module = sys.modules.get(name)
+			if module is not None and not getattr(module, '__file__', '').startswith(os.path.abspath(GROUPSCODE)):
+				del sys.modules[name]
+		import lexer, parser, interpreter
+		self.lexer = lexer
+		self.parser = parser
+		self.interpreter = interpreter
+
+	def texts(self, program):
+		return program
+
+	def lex(self, text):
+		return self.lexer.Lex('<bench>', text).make_tokens()
+
+	def parse(self, tokens):
+		ast = self.parser.Parser(tokens).parse()
+		return ast.node, ast.error
+
+	def context(self, prelude):
+		context = self.interpreter.Context('<program>')
+		context.symbol_table = self.interpreter.SymbolTable()
+		context.symbol_table.set('null', self.interpreter.Number(0))
+		for text in prelude:
+			self.run(text, context)
+		return context
+
+	def evaluate(self, node, context):
+		result = self.interpreter.Interpreter().visit(node, context)
+		return result.value, result.error
+
+	def run(self, text, context):
+		tokens, error = self.lex(text)
+		if error: return None, error
+		node, error = self.parse(tokens)
+		if error: return None, error
+		return self.evaluate(node, context)
+
+IMPLEMENTATIONS = {
+	'main': Main,
+	'main-fast': MainFast,
+	'groupscode': Groupscode,
+}
+
+def best_of(repeat, func):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, result
+
+def bench(impl, programs, prelude, repeat):
+	texts = [text for program in programs for text in impl.texts(program)]
+	statements = sum(len(program) for program in programs)
+
+	lex_time, lexed = best_of(repeat, lambda: [impl.lex(text) for text in texts])
+	token_lists = [tokens for tokens, error in lexed if not error]
+	parse_time, parsed = best_of(repeat, lambda: [impl.parse(tokens) for tokens in token_lists])
+	nodes = [node for node, error in parsed if not error]
+
+	# Every round evaluates in a fresh context, since programs assign variables
+	def evaluate():
+		context = impl.context(prelude)
+		return [impl.evaluate(node, context) for node in nodes]
+
+	def run():
+		context = impl.context(prelude)
+		return [impl.run(text, context) for text in texts]
+
+	evaluate_time, evaluated = best_of(repeat, evaluate)
+	run_time, ran = best_of(repeat, run)
+
+	results = {}
+	counts = {
+		'lex': sum(1 for _, error in lexed if error),
+		'parse': sum(1 for _, error in parsed if error),
+		'evaluate': sum(1 for _, error in evaluated if error),
+		'run': sum(1 for _, error in ran if error),
+	}
+	for phase, seconds in zip(PHASES, (lex_time, parse_time, evaluate_time, run_time)):
+		results[phase] = {
+			'seconds': seconds,
+			'statements_per_second': statements / seconds if seconds else None,
+			'errors': counts[phase],
+		}
+	return results
+
+def run_suite(implementations=None, repeat=3, **settings):
+	config = dict(corpus.DEFAULTS, **settings)
+	programs = corpus.generate(**config)
+	prelude = corpus.prelude(config['identifiers'])
+
+	results = {}
+	for name in implementations or IMPLEMENTATIONS:
+		if name == 'groupscode' and '^' in config['operators']:
+			raise Exception("groupscode has no '^'; leave it out of operators")
+		results[name] = bench(IMPLEMENTATIONS[name](), programs, prelude, repeat)
+
+	return {
+		'meta': {
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+			'repeat': repeat,
+			'corpus': config,
+			'statements': sum(len(program) for program in programs),
+		},
+		'results': results,
+	}
+
+# Phases more than threshold slower in new than in old, as (name, phase, old, new)
+def compare(old, new, threshold=0.1):
+	if old['meta']['corpus'] != new['meta']['corpus']:
+		raise Exception('Results were measured on different corpora')
+
+	regressions = []
+	for name, phases in new['results'].items():
+		for phase, result in phases.items():
+			before = old['results'].get(name, {}).get(phase)
+			if before is None: continue
+			if result['seconds'] > before['seconds'] * (1 + threshold):
+				regressions.append((name, phase, before['seconds'], result['seconds']))
+	return regressions
+
+def print_results(data):
+	meta = data['meta']
+	print(f"corpus: {meta['statements']} statements, seed {meta['corpus']['seed']}, best of {meta['repeat']}")
+	for name, phases in data['results'].items():
+		print(name)
+		for phase, result in phases.items():
+			print(f"  {phase:>8}: {result['seconds'] * 1e3:9.1f} ms  {result['statements_per_second']:12,.0f} statements/s  ({result['errors']} errors)")
+
+def main_(argv=None):
+	parser = argparse.ArgumentParser(description='Time the MiniLang lexers, parsers and interpreters.')
+	parser.add_argument('--impl', action='append', choices=list(IMPLEMENTATIONS), help='implementation to measure; repeat for several (default: all)')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--out', help='write the results to this JSON file')
+	parser.add_argument('--compare', help='JSON file of an earlier run to check for regressions')
+	parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown per phase, as a fraction (default: 0.1)')
+	for key, value in corpus.DEFAULTS.items():
+		parser.add_argument('--' + key, type=type(value), default=value)
+	args = parser.parse_args(argv)
+
+	settings = {key: getattr(args, key) for key in corpus.DEFAULTS}
+	data = run_suite(args.impl, args.repeat, **settings)
+	print_results(data)
+
+	if args.out:
+		with open(args.out, 'w') as f:
+			json.dump(data, f, indent=2)
+
+	if args.compare:
+		with open(args.compare) as f:
+			old = json.load(f)
+		regressions = compare(old, data, args.threshold)
+		for name, phase, before, after in regressions:
+			print(f'regression: {name} {phase} {before * 1e3:.1f} ms -> {after * 1e3:.1f} ms')
+		if regressions: return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main_())
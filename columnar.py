@@ -0,0 +1,164 @@
+"""
+Evaluates one MiniLang expression over whole NumPy columns, one ufunc call
+per operator. A division by zero marks its rows in ColumnResult.mask and
+makes them nan; integer columns use NumPy's fixed-width arithmetic.
+
+    result, error = run_columns('<formulas>', 'VAR y = a / b', {'a': a, 'b': b})
+    result.values, result.failed_rows, result.columns['y']
+"""
+import numpy as np
+
+import main
+
+
+class ColumnResult:
+	def __init__(self, values, mask, columns):
+		self.values = values
+		self.mask = mask
+		self.columns = columns
+
+	@property
+	def failed_rows(self):
+		return np.flatnonzero(self.mask)
+
+	def __repr__(self):
+		return f'<ColumnResult rows={len(self.values)} failed={int(self.mask.sum())}>'
+
+
+class ColumnInterpreter:
+	def __init__(self, columns, rows, symbol_table):
+		self.columns = columns
+		self.symbol_table = symbol_table
+		self.mask = np.zeros(rows, dtype=bool)
+
+	def visit(self, node, context):
+		method_name = f'visit_{type(node).__name__}'
+		method = getattr(self, method_name, self.no_visit_method)
+		return method(node, context)
+
+	def no_visit_method(self, node, context):
+		raise Exception(f'No visit_{type(node).__name__} method defined')
+
+	###################################
+
+	def visit_NumberNode(self, node, context):
+		return main.RTResult().success(node.tok.value)
+
+	def visit_VarAccessNode(self, node, context):
+		res = main.RTResult()
+		var_name = node.var_name_tok.value
+
+		value = self.columns.get(var_name)
+		if value is not None: return res.success(value)
+
+		# Names without a column fall back to scalar bindings such as null
+		value = self.symbol_table.get(var_name)
+		if value is None:
+			return res.failure(main.RTError(
+				node.pos_start, node.pos_end,
+				f"'{var_name}' is not defined",
+				context
+			))
+		return res.success(value.value)
+
+	def visit_VarAssignNode(self, node, context):
+		res = main.RTResult()
+		value = res.register(self.visit(node.value_node, context))
+		if res.error: return res
+
+		self.columns[node.var_name_tok.value] = value
+		return res.success(value)
+
+	def visit_BinOpNode(self, node, context):
+		res = main.RTResult()
+		left = res.register(self.visit(node.left_node, context))
+		if res.error: return res
+		right = res.register(self.visit(node.right_node, context))
+		if res.error: return res
+
+		op = node.op_tok.type
+		if op == main.TT_PLUS:
+			result = np.add(left, right)
+		elif op == main.TT_MINUS:
+			result = np.subtract(left, right)
+		elif op == main.TT_MUL:
+			result = np.multiply(left, right)
+		elif op == main.TT_DIV:
+			result = self.divide(left, right)
+		elif op == main.TT_POW:
+			result = self.power(left, right)
+
+		return res.success(result)
+
+	def visit_ProgramNode(self, node, context):
+		res = main.RTResult()
+		for statement in node.statements:
+			value = res.register(self.visit(statement, context))
+			if res.error: return res
+		return res.success(value)
+
+	def visit_UnaryOpNode(self, node, context):
+		res = main.RTResult()
+		value = res.register(self.visit(node.node, context))
+		if res.error: return res
+
+		if node.op_tok.type == main.TT_MINUS:
+			value = np.multiply(value, -1)
+		return res.success(value)
+
+	###################################
+
+	def fail_rows(self, failed):
+		self.mask |= np.broadcast_to(failed, self.mask.shape)
+
+	def divide(self, left, right):
+		zero = np.equal(right, 0)
+		if not np.any(zero):
+			return np.true_divide(left, right)
+
+		self.fail_rows(zero)
+		result = np.true_divide(left, np.where(zero, 1, right))
+		return np.where(zero, np.nan, result)
+
+	def power(self, left, right):
+		integers = is_integer(left) and is_integer(right)
+		negative = np.less(right, 0)
+
+		# Python turns int ** -n into a float; NumPy refuses it for int arrays
+		if integers and np.any(negative):
+			left = np.asarray(left, dtype=float)
+
+		# 0 ^ -n is a ZeroDivisionError for Python numbers
+		zero = np.logical_and(np.equal(left, 0), negative)
+		if not np.any(zero):
+			return np.power(left, right)
+
+		self.fail_rows(zero)
+		result = np.power(np.where(zero, 1, left), right)
+		return np.where(zero, np.nan, result)
+
+
+def is_integer(value):
+	return np.issubdtype(np.result_type(value), np.integer)
+
+
+# Returns (ColumnResult, None), or (None, error) for a lex, parse or undefined
+# variable error; columns maps names to equally long 1-D arrays
+def run_columns(fn, text, columns, symbol_table=None):
+	columns = {name: np.asarray(values) for name, values in columns.items()}
+	rows = len(next(iter(columns.values()))) if columns else 1
+	for name, values in columns.items():
+		if values.shape != (rows,):
+			raise Exception(f"Column '{name}' does not have {rows} rows")
+
+	program = main.program_cache.load(fn, text)
+	if program.error: return None, program.error
+
+	interpreter = ColumnInterpreter(columns, rows, main.global_symbol_table if symbol_table is None else symbol_table)
+	context = main.Context('<program>')
+	context.symbol_table = interpreter.symbol_table
+	result = interpreter.visit(program.node, context)
+	if result.error: return None, result.error
+
+	values = np.broadcast_to(result.value, (rows,))
+	return ColumnResult(values, interpreter.mask, columns), None
@@ -0,0 +1,263 @@
+"""
+Local evaluation daemon: forked workers serve line-delimited JSON on a Unix
+socket or localhost TCP port, with warm parse caches. A request such as
+
+    {"text": "VAR y = x * 2", "bindings": {"x": 21}, "id": 1}
+
+gets {"value": 42, "id": 1} or {"error": "...", "id": 1}. Each connection
+is one main.Session until it closes or sends "reset": true. Results with no
+JSON form, such as inf, nan or complex numbers, come back as errors.
+
+    python daemon.py serve [--unix PATH | --tcp [HOST:]PORT] [--workers N]
+    python daemon.py client [--unix PATH | --tcp [HOST:]PORT] [-b NAME=VALUE] [TEXT]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+
+import main
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f'minilang-{os.getuid()}.sock')
+
+
+def parse_address(unix=None, tcp=None):
+	# A path for a Unix domain socket or a (host, port) tuple
+	if tcp is None: return unix or DEFAULT_SOCKET
+	host, _, port = tcp.rpartition(':')
+	return (host or '127.0.0.1', int(port))
+
+
+def listen(address):
+	if isinstance(address, tuple):
+		sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	else:
+		if os.path.exists(address): os.unlink(address)
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.bind(address)
+	sock.listen(128)
+	return sock
+
+
+def connect(address):
+	if isinstance(address, tuple):
+		sock = socket.create_connection(address)
+		sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	else:
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.connect(address)
+	return sock
+
+
+#===================================================#
+#                      Server                       #
+#===================================================#
+
+def set_bindings(session, bindings):
+	for name, value in bindings.items():
+		if type(value) not in (int, float):
+			raise ValueError(f"Binding '{name}' is not a number")
+		session.set(name, value)
+
+
+def reject_constant(name):
+	raise ValueError(f'{name} is not valid JSON')
+
+
+class Connection:
+	# One connection's main.Session and the budget of its requests
+	def __init__(self, engine, budget=None):
+		self.engine = engine
+		self.budget = budget
+		self.session = engine.session()
+
+	def respond(self, line):
+		# Returns the response line, which is always standard JSON
+		request = None
+		try:
+			request = json.loads(line, parse_constant=reject_constant)
+			text = request['text']
+			if not isinstance(text, str): raise ValueError("'text' is not a string")
+			if request.get('reset'): self.session = self.engine.session()
+			set_bindings(self.session, request.get('bindings') or {})
+		except (ValueError, KeyError, TypeError, AttributeError) as e:
+			return encode({'error': f'Bad request: {e}'}, request)
+
+		try:
+			value, error = self.session.run(request.get('fn', '<daemon>'), text, self.budget)
+		except Exception as e:
+			# A formula the engine cannot handle, such as one nested too deep,
+			# must not take the worker down
+			return encode({'error': f'Internal error: {type(e).__name__}: {e}'}, request)
+
+		if error: return encode({'error': error.as_string()}, request)
+		try:
+			return encode({'value': value.value}, request)
+		except (ValueError, TypeError):
+			# Complex results, inf and nan have no JSON form
+			return encode({'error': f'Result {value.value!r} cannot be sent as JSON'}, request)
+
+
+def encode(response, request):
+	if isinstance(request, dict) and 'id' in request: response['id'] = request['id']
+	return json.dumps(response, allow_nan=False)
+
+
+def handle(conn, engine, budget):
+	connection = Connection(engine, budget)
+	with conn, conn.makefile('rb') as reader:
+		for line in reader:
+			if not line.strip(): continue
+			conn.sendall(connection.respond(line).encode() + b'\n')
+
+
+def worker(sock, engine, budget):
+	# Every connection gets a thread, so an idle session does not hold up others
+	tcp = sock.family == socket.AF_INET
+	while True:
+		conn, _ = sock.accept()
+		if tcp: conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		threading.Thread(target=handle, args=(conn, engine, budget), daemon=True).start()
+
+
+# Forks workers on the listening socket and replaces any that exit, until SIGTERM
+def serve(address, workers=None, engine='vm', budget=None, cache_dir=None):
+	if budget is not None and engine not in main.BUDGET_ENGINES:
+		raise Exception(f"Engine '{engine}' does not support budgets")
+	runner = main.Engine(engine)
+	if cache_dir is not None:
+		main.program_cache.disk = main.DiskCache(cache_dir)
+		main.program_cache.disk.open_pack()
+
+	sock = listen(address)
+	children = set()
+
+	def spawn():
+		pid = os.fork()
+		if pid == 0:
+			signal.signal(signal.SIGTERM, signal.SIG_DFL)
+			signal.signal(signal.SIGINT, signal.SIG_IGN)
+			try:
+				worker(sock, runner, budget)
+			finally:
+				os._exit(1)
+		children.add(pid)
+
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+	try:
+		for _ in range(workers or os.cpu_count() or 1):
+			spawn()
+		while True:
+			pid, _ = os.wait()
+			children.discard(pid)
+			spawn()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		for pid in children:
+			try:
+				os.kill(pid, signal.SIGTERM)
+			except ProcessLookupError:
+				pass
+		for pid in children:
+			try:
+				os.waitpid(pid, 0)
+			except ChildProcessError:
+				pass
+		sock.close()
+		if not isinstance(address, tuple): os.unlink(address)
+
+
+#===================================================#
+#                      Client                       #
+#===================================================#
+
+# One connection, and so one session, to a running daemon
+class Client:
+	def __init__(self, address=DEFAULT_SOCKET):
+		self.sock = connect(address)
+		self.reader = self.sock.makefile('rb')
+
+	def request(self, **request):
+		self.sock.sendall(json.dumps(request).encode() + b'\n')
+		line = self.reader.readline()
+		if not line: raise ConnectionError('The daemon closed the connection')
+		return json.loads(line)
+
+	def run(self, text, bindings=None, reset=False):
+		# Returns (value, None) or (None, error string)
+		request = {'text': text}
+		if bindings: request['bindings'] = bindings
+		if reset: request['reset'] = True
+		response = self.request(**request)
+		return response.get('value'), response.get('error')
+
+	def close(self):
+		self.reader.close()
+		self.sock.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+def parse_binding(text):
+	name, _, value = text.partition('=')
+	try:
+		return name, int(value)
+	except ValueError:
+		return name, float(value)
+
+
+def client_main(args):
+	bindings = dict(parse_binding(binding) for binding in args.bind)
+	with Client(parse_address(args.unix, args.tcp)) as client:
+		texts = [args.text] if args.text is not None else (line.rstrip('\n') for line in sys.stdin)
+		status = 0
+		for text in texts:
+			value, error = client.run(text, bindings)
+			bindings = None
+			if error:
+				print(error, file=sys.stderr)
+				status = 1
+			else:
+				print(value)
+		return status
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='MiniLang evaluation daemon and client.')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	serve_parser = commands.add_parser('serve')
+	client_parser = commands.add_parser('client')
+	for command in (serve_parser, client_parser):
+		where = command.add_mutually_exclusive_group()
+		where.add_argument('--unix', metavar='PATH', help=f'Unix domain socket (default: {DEFAULT_SOCKET})')
+		where.add_argument('--tcp', metavar='[HOST:]PORT', help='TCP address, on 127.0.0.1 unless HOST is given')
+
+	serve_parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+	serve_parser.add_argument('--engine', default='vm', choices=list(main.ENGINES))
+	serve_parser.add_argument('--cache-dir', help='directory for a disk cache of parsed programs')
+	serve_parser.add_argument('--max-steps', type=int, help='step budget of each request')
+	serve_parser.add_argument('--timeout', type=float, help='time budget of each request, in seconds')
+	serve_parser.add_argument('--max-int-bits', type=int, help='largest int that * and ^ may produce, in bits')
+
+	client_parser.add_argument('-b', '--bind', action='append', default=[], metavar='NAME=VALUE')
+	client_parser.add_argument('text', nargs='?', help='formula to run; stdin lines when left out')
+
+	args = parser.parse_args()
+	if args.command == 'serve':
+		budget = None
+		if args.max_steps is not None or args.timeout is not None or args.max_int_bits is not None:
+			budget = main.Budget(args.max_steps, args.timeout, args.max_int_bits)
+		serve(parse_address(args.unix, args.tcp), args.workers, args.engine, budget, args.cache_dir)
+	else:
+		sys.exit(client_main(args))
@@ -1,4 +1,6 @@
 class NumberNode:
+	__slots__ = ('tok', 'pos_start', 'pos_end')
+
 	def __init__(self, tok):
 		self.tok = tok
 
@@ -9,6 +11,8 @@ class NumberNode:
 		return f'{self.tok}'
 
 class VarAccessNode:
+	__slots__ = ('var_name_tok', 'pos_start', 'pos_end')
+
 	def __init__(self, var_name_tok):
 		self.var_name_tok = var_name_tok
 
@@ -18,6 +22,8 @@ class VarAccessNode:
 		return f'({self.var_name_tok})'
 
 class VarAssignNode:
+	__slots__ = ('var_name_tok', 'value_node', 'pos_start', 'pos_end')
+
 	def __init__(self, var_name_tok, value_node):
 		self.var_name_tok = var_name_tok
 		self.value_node = value_node
@@ -28,6 +34,8 @@ class VarAssignNode:
 		return f'({self.var_name_tok}, {self.value_node})'
 
 class BinOpNode:
+	__slots__ = ('left_node', 'op_tok', 'right_node', 'pos_start', 'pos_end')
+
 	def __init__(self, left_node, op_tok, right_node):
 		self.left_node = left_node
 		self.op_tok = op_tok
@@ -40,6 +48,8 @@ class BinOpNode:
 		return f'({self.left_node}, {self.op_tok}, {self.right_node})'
 
 class UnaryOpNode:
+	__slots__ = ('op_tok', 'node', 'pos_start', 'pos_end')
+
 	def __init__(self, op_tok, node):
 		self.op_tok = op_tok
 		
@@ -22,6 +22,8 @@ KEYWORDS = [
 
 
 class RTResult:
+	__slots__ = ('value', 'error')
+
 	def __init__(self):
 		self.value = None
 		self.error = None
@@ -43,6 +45,8 @@ class RTResult:
 #=====================================#
 
 class Number:
+	__slots__ = ('value', 'pos_start', 'pos_end', 'context')
+
 	def __init__(self, value):
 		self.value = value
 		self.set_pos()
@@ -99,6 +103,8 @@ class Number:
 #=====================================#
 
 class Context:
+	__slots__ = ('display_name', 'parent', 'parent_entry_pos', 'symbol_table')
+
 	def __init__(self, display_name, parent=None, parent_entry_pos=None):
 		self.display_name = display_name
 		self.parent = parent
@@ -15,6 +15,8 @@ LETTERS_DIGITS = LETTERS + DIGITS
 #===================================================#
 
 class Position:
+    __slots__ = ('idx', 'ln', 'col', 'fn', 'ftxt')
+
     def __init__(self,idx,ln,col,fn,ftxt) -> None:
         self.idx=idx
         self.ln=ln
@@ -57,6 +59,8 @@ KEYWORDS = [
 ]
 
 class Token:
+	__slots__ = ('type', 'value', 'pos_start', 'pos_end')
+
 	def __init__(self, type_, value=None, pos_start=None, pos_end=None):
 		self.type = type_
 		self.value = value
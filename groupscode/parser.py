@@ -21,6 +21,8 @@ KEYWORDS = [
 
 
 class ParseResult:
+	__slots__ = ('error', 'node', 'advance_count')
+
 	def __init__(self):
 		self.error = None
 		self.node = None
@@ -183,10 +185,12 @@ def run(fn, text):
 		if ast.error:
 			return None, ast.error
 		return ast.node, None
-while True:
-    text = input('basic > ')
-    result, error = run('<stdin>', text)
-    if error:
-        print(error.as_string())
-    else:
-        print(result)
\ No newline at end of file
+
+if __name__ == '__main__':
+    while True:
+        text = input('basic > ')
+        result, error = run('<stdin>', text)
+        if error:
+            print(error.as_string())
+        else:
+            print(result)
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Incremental front end for editors and REPLs: a Document keeps a buffer split
+into statements like run_stream and, on each edit, re-lexes and re-parses
+only the lines it touches, giving the same tokens, nodes and errors as a
+full pass.
+
+    doc = Document('<editor>', text)
+    doc.edit(offset, removed, inserted)
+    for value, error in doc.run(): ...
+"""
+from bisect import bisect_right
+
+import main
+
+
+class Statement:
+	__slots__ = ('start', 'end', 'node', 'error', 'compiled')
+
+	def __init__(self, src, code, start, end):
+		self.start = start
+		self.end = end
+		self.node, self.error = main.parse_statement(src, code, start, end)
+		# Executable forms by (engine, optimize), built on first run
+		self.compiled = {}
+
+
+class Line:
+	__slots__ = ('src', 'in_comment', 'code', 'opened', 'statements')
+
+	def __init__(self, src, in_comment):
+		self.src = src
+		self.in_comment = in_comment
+		self.statements = []
+		self.strip()
+
+	def strip(self):
+		# code is the text with comments blanked out, opened what
+		# main.strip_comments reports about a '/*' left open
+		self.code, self.opened = main.strip_comments(self.src.text, self.in_comment)
+
+	def parse(self, pos=0):
+		# Re-splits the line from pos, which is 0 or the ';' after a kept statement
+		for m in main.STATEMENT_RE.finditer(self.code, pos):
+			if not m.group().strip(' \t'): continue
+			self.statements.append(Statement(self.src, self.code, m.start(), m.end()))
+
+
+class Document:
+	def __init__(self, fn, text=''):
+		self.fn = fn
+		self.lines = []
+		for ln, line in enumerate(text.split('\n')):
+			self.lines.append(self.make_line(line, ln, self.opens_comment(ln)))
+		self.starts = [0]
+		for line in self.lines[:-1]:
+			self.starts.append(self.starts[-1] + len(line.src.text) + 1)
+		self.size = len(text)
+		# (line, delta): starts after that line are still short by delta.
+		# Consecutive edits in one line, like typing, only add to delta.
+		self.shift = None
+
+	def make_line(self, text, ln, in_comment):
+		line = Line(main.Source(self.fn, text, ln), in_comment)
+		line.parse()
+		return line
+
+	def opens_comment(self, ln):
+		# Whether line ln starts inside a '/*' comment left open before it
+		return ln > 0 and self.lines[ln - 1].opened is not None
+
+	def relex_after(self, ln):
+		# Lines keep their statements as long as they still start in the
+		# comment state they were lexed in
+		for ln in range(ln + 1, len(self.lines)):
+			line = self.lines[ln]
+			in_comment = self.opens_comment(ln)
+			if line.in_comment == in_comment: return
+			line.in_comment = in_comment
+			line.strip()
+			line.statements = []
+			line.parse()
+
+	@property
+	def text(self):
+		return '\n'.join(line.src.text for line in self.lines)
+
+	def __len__(self):
+		return self.size
+
+	def flush(self):
+		if self.shift is None: return
+		ln, delta = self.shift
+		self.starts[ln + 1:] = [start + delta for start in self.starts[ln + 1:]]
+		self.shift = None
+
+	# Replaces removed characters at offset; returns the range of rebuilt line numbers
+	def edit(self, offset, removed, inserted):
+		if offset < 0 or removed < 0 or offset + removed > self.size:
+			raise Exception(f'Edit {offset}+{removed} is outside the document')
+		self.size += len(inserted) - removed
+
+		if self.shift is not None:
+			ln, delta = self.shift
+			line = self.lines[ln]
+			base = self.starts[ln]
+			if '\n' not in inserted and base <= offset and offset + removed <= base + len(line.src.text):
+				text = line.src.text
+				col = offset - base
+				self.edit_line(line, text[:col] + inserted + text[col + removed:], col)
+				self.relex_after(ln)
+				self.shift = (ln, delta + len(inserted) - removed)
+				return ln, ln + 1
+			self.flush()
+
+		first = bisect_right(self.starts, offset) - 1
+		last = bisect_right(self.starts, offset + removed) - 1
+		base = self.starts[first]
+		old = '\n'.join(line.src.text for line in self.lines[first:last + 1])
+		texts = (old[:offset - base] + inserted + old[offset + removed - base:]).split('\n')
+
+		if first == last and len(texts) == 1:
+			self.edit_line(self.lines[first], texts[0], offset - base)
+			self.relex_after(first)
+			self.shift = (first, len(inserted) - removed)
+			return first, first + 1
+
+		del self.lines[first:last + 1]
+		for i, text in enumerate(texts):
+			self.lines.insert(first + i, self.make_line(text, first + i, self.opens_comment(first + i)))
+		# Later lines keep their tokens; only their line numbers move
+		if len(texts) != last + 1 - first:
+			for ln in range(first + len(texts), len(self.lines)):
+				self.lines[ln].src.first_line = ln
+		self.relex_after(first + len(texts) - 1)
+
+		starts = [base]
+		for line in self.lines[first:first + len(texts) - 1]:
+			starts.append(starts[-1] + len(line.src.text) + 1)
+		delta = len(inserted) - removed
+		self.starts[first:] = starts + [start + delta for start in self.starts[last + 1:]]
+		return first, first + len(texts)
+
+	def edit_line(self, line, text, col):
+		# Statements that end before the edit keep their tokens, which only
+		# point at text that did not move
+		kept = [statement for statement in line.statements if statement.end < col]
+		line.src.text = text
+		line.src.line_starts = None
+		line.strip()
+		line.statements = kept
+		line.parse(kept[-1].end if kept else 0)
+
+	def statements(self):
+		for line in self.lines:
+			yield from line.statements
+
+		# Like main.iter_statements, an unclosed '/*' becomes a statement
+		# that fails to lex
+		if self.lines[-1].opened is not None:
+			line = next(line for line in reversed(self.lines) if line.opened is not None and line.opened >= 0)
+			yield Statement(line.src, line.src.text, line.opened, line.opened + 2)
+
+	def errors(self):
+		return [statement.error for statement in self.statements() if statement.error]
+
+	# Runs the statements in order up to the first error, reusing compiled forms
+	def run(self, engine='vm', optimize=False, symbol_table=None):
+		compile_, execute = main.ENGINES[engine]
+		context = main.Context('<program>')
+		context.symbol_table = main.global_symbol_table if symbol_table is None else symbol_table
+
+		results = []
+		for statement in self.statements():
+			if statement.error:
+				results.append((None, statement.error))
+				break
+
+			code = statement.compiled.get((engine, optimize))
+			if code is None:
+				node = main.Optimizer().optimize(statement.node) if optimize else statement.node
+				code = statement.compiled[engine, optimize] = compile_(node)
+			result = execute(code, context)
+			results.append((result.value, result.error))
+			if result.error: break
+		return results
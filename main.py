@@ -1,5 +1,19 @@
 from string_with_arrows import *
 import string
+import re
+import os
+import sys
+import hashlib
+import math
+import marshal
+import mmap
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import islice
 
 #===================================================#
 #                    Constants                      #
@@ -30,10 +44,20 @@ class IllegalCharError(Error):
 	def __init__(self, pos_start, pos_end, details):
 		super().__init__(pos_start, pos_end, 'Illegal Character', details)
 
+class ExpectedCharError(Error):
+	def __init__(self, pos_start, pos_end, details):
+		super().__init__(pos_start, pos_end, 'Expected Character', details)
+
 class InvalidSyntaxError(Error):
 	def __init__(self, pos_start, pos_end, details=''):
 		super().__init__(pos_start, pos_end, 'Invalid Syntax', details)
 
+class Failure(Exception):
+	# Carries an Error out of code that raises instead of returning a result
+	# object; unwrapped again where (value, error) results are produced
+	def __init__(self, error):
+		self.error = error
+
 class RTError(Error):
 	def __init__(self, pos_start, pos_end, details, context):
 		super().__init__(pos_start, pos_end, 'Runtime Error', details)
@@ -57,33 +81,84 @@ class RTError(Error):
 
 		return 'Traceback (most recent call last):\n' + result
 
+class BudgetError(RTError):
+	# A run stopped by its Budget rather than by an error in the program
+	def __init__(self, pos_start, pos_end, details, context):
+		super().__init__(pos_start, pos_end, details, context)
+		self.error_name = 'Budget Exceeded'
+
 
 
 
+#===================================================#
+#                       Source                      #
+#===================================================#
+
+class Source:
+	__slots__ = ('fn', 'text', 'line_starts', 'first_line')
+
+	# first_line numbers the lines of a text that was cut out of a larger
+	# file, such as one line of a streamed script.
+	def __init__(self, fn, text, first_line=0):
+		self.fn = fn
+		self.text = text
+		self.line_starts = None
+		self.first_line = first_line
+
+	def line_col(self, idx):
+		# The line-start index is only built once an error needs a line number
+		if self.line_starts is None:
+			self.line_starts = [0] + [m.end() for m in re.finditer('\n', self.text)]
+
+		ln = max(bisect_right(self.line_starts, idx) - 1, 0)
+		return ln + self.first_line, idx - self.line_starts[ln]
+
 #===================================================#
 #                      Position                     #
 #===================================================#
 
 class Position:
-    def __init__(self,idx,ln,col,fn,ftxt) -> None:
+    __slots__ = ('idx', 'src')
+
+    def __init__(self,idx,src) -> None:
         self.idx=idx
-        self.ln=ln
-        self.col=col
-        self.fn=fn
-        self.ftxt=ftxt
+        self.src=src
 
-    def advance(self,current_char=None):
-        self.idx+=1
-        self.col+=1
+    @property
+    def ln(self):
+        return self.src.line_col(self.idx)[0]
 
-        if current_char =='\n':
-            self.ln +=1
-            self.col =0
+    @property
+    def col(self):
+        return self.src.line_col(self.idx)[1]
 
+    @property
+    def fn(self):
+        return self.src.fn
+
+    @property
+    def ftxt(self):
+        return self.src.text
+
+    def advance(self,current_char=None):
+        self.idx+=1
         return self
     
     def copy(self):
-        return Position(self.idx,self.ln,self.col,self.fn,self.ftxt)
+        return Position(self.idx,self.src)
+
+class Span:
+	__slots__ = ()
+
+	# Tokens and nodes keep integer offsets into their Source and only
+	# build Position objects when an error asks for them.
+	@property
+	def pos_start(self):
+		return Position(self.start, self.src)
+
+	@property
+	def pos_end(self):
+		return Position(self.end, self.src)
 
 #===================================================#
 #                      Tokens                       #
@@ -101,24 +176,27 @@ TT_POW		= 'POW'
 TT_EQ		= 'EQ'
 TT_LPAREN   	= 'LPAREN'
 TT_RPAREN   	= 'RPAREN'
+TT_NEWLINE	= 'NEWLINE'
 TT_EOF		= 'EOF'
 
 KEYWORDS = [
 	'VAR'
 ]
 
-class Token:
+class Token(Span):
+	__slots__ = ('type', 'value', 'src', 'start', 'end')
+
 	def __init__(self, type_, value=None, pos_start=None, pos_end=None):
 		self.type = type_
 		self.value = value
 
 		if pos_start:
-			self.pos_start = pos_start.copy()
-			self.pos_end = pos_start.copy()
-			self.pos_end.advance()
+			self.src = pos_start.src
+			self.start = pos_start.idx
+			self.end = pos_start.idx + 1
 
 		if pos_end:
-			self.pos_end = pos_end.copy()
+			self.end = pos_end.idx
 
 	def matches(self, type_, value):
 		return self.type == type_ and self.value == value
@@ -138,7 +216,8 @@ class Lexer:
 	def __init__(self, fn, text):
 		self.fn = fn
 		self.text = text
-		self.pos = Position(-1, 0, -1, fn, text)
+		self.src = Source(fn, text)
+		self.pos = Position(-1, self.src)
 		self.current_char = None
 		self.advance()
 	
@@ -152,6 +231,12 @@ class Lexer:
 		while self.current_char != None:
 			if self.current_char in ' \t':
 				self.advance()
+			elif self.current_char in ';\n':
+				tokens.append(Token(TT_NEWLINE, pos_start=self.pos))
+				self.advance()
+			elif self.current_char == '/' and self.peek() in ('/', '*'):
+				error = self.skip_comment()
+				if error: return [], error
 			elif self.current_char in DIGITS:
 				tokens.append(self.make_number())
 			elif self.current_char in LETTERS:
@@ -189,6 +274,31 @@ class Lexer:
 		tokens.append(Token(TT_EOF, pos_start=self.pos))
 		return tokens, None
 
+	def peek(self):
+		idx = self.pos.idx + 1
+		return self.text[idx] if idx < len(self.text) else ''
+
+	def skip_comment(self):
+		pos_start = self.pos.copy()
+		self.advance()
+
+		# '//' runs to the end of the line and leaves the newline as a token
+		if self.current_char == '/':
+			while self.current_char != None and self.current_char != '\n':
+				self.advance()
+			return None
+
+		# '/*' runs to the next '*/', across lines
+		self.advance()
+		while self.current_char != None:
+			if self.current_char == '*' and self.peek() == '/':
+				self.advance()
+				self.advance()
+				return None
+			self.advance()
+
+		return ExpectedCharError(pos_start, Position(pos_start.idx + 2, self.src), "'*/' to close the comment")
+
 	def make_number(self):
 		num_str = ''
 		dot_count = 0
@@ -218,57 +328,167 @@ class Lexer:
 		return Token(tok_type, id_str, pos_start, self.pos)
 
 
+#===================================================#
+#                    Regex Lexer                    #
+#===================================================#
+
+# One match per token after skipping blanks and comments; the token group always
+# matches, so the skip never backtracks, and an unclosed '/*' fails in linear time
+TOKEN_RE = re.compile(
+	r'(?:[ \t]+|//[^\n]*|/\*[^*]*\*+(?:[^*/][^*]*\*+)*/)*'
+	r'(?:([0-9]+(?:\.[0-9]*)?)|([A-Za-z][A-Za-z0-9_]*)|(/\*)|([-+*/^=()])|([\n;])|(.|\Z))',
+	re.S
+)
+
+OP_TOKENS = {
+	'+': TT_PLUS,
+	'-': TT_MINUS,
+	'*': TT_MUL,
+	'/': TT_DIV,
+	'^': TT_POW,
+	'=': TT_EQ,
+	'(': TT_LPAREN,
+	')': TT_RPAREN,
+}
+
+class RegexLexer:
+	def __init__(self, fn, text, start=0, end=None, src=None):
+		self.fn = fn
+		self.text = text
+		self.start = start
+		self.end = len(text) if end is None else end
+		self.src = src or Source(fn, text)
+		self.error = None
+
+	def make_tokens(self):
+		tokens = list(self.iter_tokens())
+		if self.error: return [], self.error
+		return tokens, None
+
+	def iter_tokens(self):
+		# An illegal character ends the stream with EOF and leaves its error in self.error
+		src = self.src
+		eof = self.end
+
+		for m in TOKEN_RE.finditer(self.text, self.start, self.end):
+			kind = m.lastindex
+			start = m.start(kind)
+			end = m.end()
+			value = m.group(kind)
+
+			if kind == 1:
+				if '.' in value:
+					tok = Token(TT_FLOAT, float(value))
+				else:
+					tok = Token(TT_INT, int(value))
+			elif kind == 2:
+				tok = Token(TT_KEYWORD if value in KEYWORDS else TT_IDENTIFIER, value)
+			elif kind == 4:
+				tok = Token(OP_TOKENS[value])
+			elif kind == 5:
+				tok = Token(TT_NEWLINE)
+			elif kind == 3:
+				self.error = ExpectedCharError(Position(start, src), Position(end, src), "'*/' to close the comment")
+				eof = start
+				break
+			elif value:
+				self.error = IllegalCharError(Position(start, src), Position(end, src), "'" + value + "'")
+				eof = start
+				break
+			else:
+				break
+
+			tok.start = start
+			tok.end = end
+			tok.src = src
+			yield tok
+
+		tok = Token(TT_EOF)
+		tok.start = eof
+		tok.end = eof + 1
+		tok.src = src
+		yield tok
+
+
 #===================================#
 #          Nodes                    #
 #===================================#
 
-class NumberNode:
+class NumberNode(Span):
+	__slots__ = ('tok', 'src', 'start', 'end')
+
 	def __init__(self, tok):
 		self.tok = tok
 
-		self.pos_start = self.tok.pos_start
-		self.pos_end = self.tok.pos_end
+		self.src = tok.src
+		self.start = tok.start
+		self.end = tok.end
 
 	def __repr__(self):
 		return f'{self.tok}'
 
-class VarAccessNode:
+class VarAccessNode(Span):
+	__slots__ = ('var_name_tok', 'src', 'start', 'end')
+
 	def __init__(self, var_name_tok):
 		self.var_name_tok = var_name_tok
 
-		self.pos_start = self.var_name_tok.pos_start
-		self.pos_end = self.var_name_tok.pos_end
+		self.src = var_name_tok.src
+		self.start = var_name_tok.start
+		self.end = var_name_tok.end
+
+class VarAssignNode(Span):
+	__slots__ = ('var_name_tok', 'value_node', 'src', 'start', 'end')
 
-class VarAssignNode:
 	def __init__(self, var_name_tok, value_node):
 		self.var_name_tok = var_name_tok
 		self.value_node = value_node
 
-		self.pos_start = self.var_name_tok.pos_start
-		self.pos_end = self.value_node.pos_end
+		self.src = var_name_tok.src
+		self.start = var_name_tok.start
+		self.end = value_node.end
+
+class BinOpNode(Span):
+	__slots__ = ('left_node', 'op_tok', 'right_node', 'src', 'start', 'end')
 
-class BinOpNode:
 	def __init__(self, left_node, op_tok, right_node):
 		self.left_node = left_node
 		self.op_tok = op_tok
 		self.right_node = right_node
 
-		self.pos_start = self.left_node.pos_start
-		self.pos_end = self.right_node.pos_end
+		self.src = op_tok.src
+		self.start = left_node.start
+		self.end = right_node.end
 
 	def __repr__(self):
 		return f'({self.left_node}, {self.op_tok}, {self.right_node})'
 
-class UnaryOpNode:
+class UnaryOpNode(Span):
+	__slots__ = ('op_tok', 'node', 'src', 'start', 'end')
+
 	def __init__(self, op_tok, node):
 		self.op_tok = op_tok
 		self.node = node
 
-		self.pos_start = self.op_tok.pos_start
-		self.pos_end = node.pos_end
+		self.src = op_tok.src
+		self.start = op_tok.start
+		self.end = node.end
 
 	def __repr__(self):
 		return f'({self.op_tok}, {self.node})'
+
+class ProgramNode(Span):
+	__slots__ = ('statements', 'src', 'start', 'end')
+
+	def __init__(self, statements):
+		self.statements = statements
+
+		self.src = statements[0].src
+		self.start = statements[0].start
+		self.end = statements[-1].end
+
+	def __repr__(self):
+		return '; '.join(repr(statement) for statement in self.statements)
 	
 
 
@@ -278,6 +498,8 @@ class UnaryOpNode:
 #===================================#
 
 class ParseResult:
+	__slots__ = ('error', 'node', 'advance_count')
+
 	def __init__(self):
 		self.error = None
 		self.node = None
@@ -319,7 +541,7 @@ class Parser:
 		return self.current_tok
 
 	def parse(self):
-		res = self.expr()
+		res = self.statements()
 		if not res.error and self.current_tok.type != TT_EOF:
 			return res.failure(InvalidSyntaxError(
 				self.current_tok.pos_start, self.current_tok.pos_end,
@@ -329,6 +551,30 @@ class Parser:
 
 	###################################
 
+	def statements(self):
+		# A program of one statement is just that statement's node, so
+		# single expressions parse exactly as they always have
+		res = ParseResult()
+		statements = []
+		self.skip_newlines(res)
+
+		while True:
+			statement = res.register(self.expr())
+			if res.error: return res
+			statements.append(statement)
+
+			if self.current_tok.type != TT_NEWLINE: break
+			self.skip_newlines(res)
+			if self.current_tok.type == TT_EOF: break
+
+		if len(statements) == 1: return res.success(statements[0])
+		return res.success(ProgramNode(statements))
+
+	def skip_newlines(self, res):
+		while self.current_tok.type == TT_NEWLINE:
+			res.register_advancement()
+			self.advance()
+
 	def atom(self):
 		res = ParseResult()
 		tok = self.current_tok
@@ -443,11 +689,330 @@ class Parser:
 
 
 
+BINDING_POWERS = {
+	TT_PLUS: 1,
+	TT_MINUS: 1,
+	TT_MUL: 2,
+	TT_DIV: 2,
+	TT_POW: 3,
+}
+
+# Operands of unary '+'/'-' and of '^' may only contain further '^'
+POW_BINDING_POWER = 3
+
+# Operator-precedence parser with the same trees and errors as Parser; pending
+# operators live on an explicit stack, so nesting is not limited by recursion
+class PrattParser(Parser):
+	def parse(self):
+		res = ParseResult()
+		try:
+			node = self.statements()
+		except Failure as failure:
+			return res.failure(failure.error)
+
+		if self.current_tok.type != TT_EOF:
+			return res.failure(InvalidSyntaxError(
+				self.current_tok.pos_start, self.current_tok.pos_end,
+				"Expected '+', '-', '*', '/' or '^'"
+			))
+		return res.success(node)
+
+	def statements(self):
+		statements = []
+		while self.current_tok.type == TT_NEWLINE: self.advance()
+
+		while True:
+			statements.append(self.expr())
+
+			if self.current_tok.type != TT_NEWLINE: break
+			while self.current_tok.type == TT_NEWLINE: self.advance()
+			if self.current_tok.type == TT_EOF: break
+
+		if len(statements) == 1: return statements[0]
+		return ProgramNode(statements)
+
+	def expr(self):
+		stack = []
+		min_bp = 0
+		# Parser.expr reports a different message when an expression
+		# fails on its very first token
+		expr_start = True
+
+		while True:
+			# An operand, possibly behind prefixes that open a new frame
+			tok = self.current_tok
+			tok_type = tok.type
+
+			if tok_type == TT_INT or tok_type == TT_FLOAT:
+				self.advance()
+				node = NumberNode(tok)
+			elif tok_type == TT_IDENTIFIER:
+				self.advance()
+				node = VarAccessNode(tok)
+			elif tok_type == TT_PLUS or tok_type == TT_MINUS:
+				self.advance()
+				stack.append((UnaryOpNode, tok, min_bp))
+				min_bp = POW_BINDING_POWER
+				expr_start = False
+				continue
+			elif tok_type == TT_LPAREN:
+				self.advance()
+				stack.append((None, tok, min_bp))
+				min_bp = 0
+				expr_start = True
+				continue
+			elif expr_start and tok.matches(TT_KEYWORD, 'VAR'):
+				self.advance()
+				if self.current_tok.type != TT_IDENTIFIER:
+					raise Failure(InvalidSyntaxError(
+						self.current_tok.pos_start, self.current_tok.pos_end,
+						"Expected identifier"
+					))
+
+				var_name = self.current_tok
+				self.advance()
+				if self.current_tok.type != TT_EQ:
+					raise Failure(InvalidSyntaxError(
+						self.current_tok.pos_start, self.current_tok.pos_end,
+						"Expected '='"
+					))
+
+				self.advance()
+				stack.append((VarAssignNode, var_name, min_bp))
+				min_bp = 0
+				continue
+			elif expr_start:
+				raise Failure(InvalidSyntaxError(
+					tok.pos_start, tok.pos_end,
+					"Expected 'VAR', int, float, identifier, '+', '-' or '('"
+				))
+			else:
+				raise Failure(InvalidSyntaxError(
+					tok.pos_start, tok.pos_end,
+					"Expected int, float, identifier, '+', '-' or '('"
+				))
+
+			expr_start = False
+
+			# Extend the operand with binary operators, closing frames that
+			# cannot take the next operator
+			while True:
+				op_tok = self.current_tok
+				bp = BINDING_POWERS.get(op_tok.type)
+
+				if bp is not None and bp >= min_bp:
+					self.advance()
+					stack.append((BinOpNode, (node, op_tok), min_bp))
+					# '^' is right associative, the others are left associative
+					min_bp = bp if bp == POW_BINDING_POWER else bp + 1
+					break
+
+				if not stack: return node
+
+				cls, data, min_bp = stack.pop()
+				if cls is BinOpNode:
+					node = BinOpNode(data[0], data[1], node)
+				elif cls is UnaryOpNode:
+					node = UnaryOpNode(data, node)
+				elif cls is VarAssignNode:
+					node = VarAssignNode(data, node)
+				elif self.current_tok.type == TT_RPAREN:
+					self.advance()
+				else:
+					raise Failure(InvalidSyntaxError(
+						self.current_tok.pos_start, self.current_tok.pos_end,
+						"Expected ')'"
+					))
+
+class StreamParser(PrattParser):
+	# PrattParser over an iterator of tokens, such as RegexLexer.iter_tokens,
+	# pulled one at a time instead of indexed in a finished list
+	def __init__(self, tokens):
+		self.stream = iter(tokens)
+		self.current_tok = None
+		self.tok_idx = -1
+		self.advance()
+
+	def advance(self):
+		self.tok_idx += 1
+		self.current_tok = next(self.stream, self.current_tok)
+		return self.current_tok
+
+	def next_statement(self):
+		# Parses the next statement of a program, or returns None once the
+		# tokens run out. Raises Failure on a syntax error.
+		while self.current_tok.type == TT_NEWLINE: self.advance()
+		if self.current_tok.type == TT_EOF: return None
+
+		node = self.expr()
+		if self.current_tok.type not in (TT_NEWLINE, TT_EOF):
+			raise Failure(InvalidSyntaxError(
+				self.current_tok.pos_start, self.current_tok.pos_end,
+				"Expected '+', '-', '*', '/' or '^'"
+			))
+		return node
+
+def stream_parse(lexer):
+	# Parses tokens as they are lexed; an illegal character past a syntax error
+	# still wins, as with make_tokens
+	tokens = lexer.iter_tokens()
+	ast = StreamParser(tokens).parse()
+	for _ in tokens: pass
+	if lexer.error: return None, lexer.error
+	return ast.node, ast.error
+
+
+#======================================#
+#         OPTIMIZER                    #
+#======================================#
+
+# Folding stops at integer results wider than this, so a formula like
+# 9 ^ 9 ^ 9 is left for the evaluator instead of hanging the optimizer.
+FOLD_MAX_BITS = 4096
+
+optimize_stats = {'runs': 0, 'eliminated': 0, 'last_eliminated': 0}
+optimize_stats_lock = threading.Lock()
+
+def record_optimized(program):
+	# Adds an optimized run to optimize_stats; runs on any thread
+	with optimize_stats_lock:
+		optimize_stats['runs'] += 1
+		optimize_stats['eliminated'] += program.eliminated
+		optimize_stats['last_eliminated'] = program.eliminated
+
+def is_int_const(node, value):
+	return isinstance(node, NumberNode) and node.tok.type == TT_INT and node.tok.value == value
+
+def make_number_node(value, node):
+	tok = Token(TT_INT if isinstance(value, int) else TT_FLOAT, value)
+	tok.src = node.src
+	tok.start = node.start
+	tok.end = node.end
+	return NumberNode(tok)
+
+def respan(new_node, node):
+	# A rebuilt node still covers the source of the node it replaces
+	new_node.start = node.start
+	new_node.end = node.end
+	return new_node
+
+def fold(op, left, right):
+	if op == TT_PLUS: return left + right
+	if op == TT_MINUS: return left - right
+	if op == TT_MUL:
+		if isinstance(left, int) and isinstance(right, int) and \
+				left.bit_length() + right.bit_length() > FOLD_MAX_BITS:
+			return None
+		return left * right
+	if op == TT_DIV:
+		# Division by zero must stay a runtime error at the divisor
+		if right == 0: return None
+		return left / right
+	if op == TT_POW:
+		if isinstance(left, int) and isinstance(right, int) and \
+				left.bit_length() * right > FOLD_MAX_BITS:
+			return None
+		return left ** right
+
+# Folds number literals and drops int identities (x*1, x+0, x^1, --x), turning
+# x^2 into x*x; the only change in results is the sign of x+0 for x = -0.0
+class Optimizer:
+	def __init__(self):
+		self.eliminated = 0
+
+	def optimize(self, node):
+		return self.visit(node, False)
+
+	# exact_span is set while visiting a divisor: its span is what a
+	# 'Division by zero' error points at, so it must not shrink.
+	def visit(self, node, exact_span):
+		method_name = f'visit_{type(node).__name__}'
+		method = getattr(self, method_name, self.no_visit_method)
+		return method(node, exact_span)
+
+	def no_visit_method(self, node, exact_span):
+		raise Exception(f'No visit_{type(node).__name__} method defined')
+
+	###################################
+
+	def visit_NumberNode(self, node, exact_span):
+		return node
+
+	def visit_VarAccessNode(self, node, exact_span):
+		return node
+
+	def visit_VarAssignNode(self, node, exact_span):
+		value_node = self.visit(node.value_node, exact_span)
+		if value_node is node.value_node: return node
+		return respan(VarAssignNode(node.var_name_tok, value_node), node)
+
+	def visit_BinOpNode(self, node, exact_span):
+		op = node.op_tok.type
+		left = self.visit(node.left_node, False)
+		right = self.visit(node.right_node, op == TT_DIV)
+
+		if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+			try:
+				value = fold(op, left.tok.value, right.tok.value)
+			except (ArithmeticError, ValueError):
+				value = None
+
+			if isinstance(value, (int, float)):
+				self.eliminated += 2
+				return make_number_node(value, node)
+
+		if not exact_span:
+			if (op == TT_MUL and is_int_const(right, 1)) or \
+					(op in (TT_PLUS, TT_MINUS) and is_int_const(right, 0)) or \
+					(op == TT_POW and is_int_const(right, 1)):
+				self.eliminated += 2
+				return left
+			if (op == TT_MUL and is_int_const(left, 1)) or \
+					(op == TT_PLUS and is_int_const(left, 0)):
+				self.eliminated += 2
+				return right
+
+		if op == TT_POW and is_int_const(right, 2) and isinstance(left, (VarAccessNode, NumberNode)):
+			mul_tok = Token(TT_MUL, pos_start=node.op_tok.pos_start)
+			return respan(BinOpNode(left, mul_tok, left), node)
+
+		if left is node.left_node and right is node.right_node: return node
+		return respan(BinOpNode(left, node.op_tok, right), node)
+
+	def visit_ProgramNode(self, node, exact_span):
+		statements = [self.visit(statement, False) for statement in node.statements]
+		if all(new is old for new, old in zip(statements, node.statements)): return node
+		return respan(ProgramNode(statements), node)
+
+	def visit_UnaryOpNode(self, node, exact_span):
+		operand = self.visit(node.node, False)
+		op = node.op_tok.type
+
+		if isinstance(operand, NumberNode):
+			self.eliminated += 1
+			value = operand.tok.value * -1 if op == TT_MINUS else operand.tok.value
+			return make_number_node(value, node)
+
+		if not exact_span:
+			if op == TT_PLUS:
+				self.eliminated += 1
+				return operand
+			if isinstance(operand, UnaryOpNode) and operand.op_tok.type == TT_MINUS:
+				self.eliminated += 2
+				return operand.node
+
+		if operand is node.node: return node
+		return respan(UnaryOpNode(node.op_tok, operand), node)
+
+
+
 #======================================#
 #         RUNTIME RESULT               #
 #=====================================#
 
 class RTResult:
+	__slots__ = ('value', 'error')
+
 	def __init__(self):
 		self.value = None
 		self.error = None
@@ -469,6 +1034,8 @@ class RTResult:
 #=====================================#
 
 class Number:
+	__slots__ = ('value', 'pos_start', 'pos_end', 'context')
+
 	def __init__(self, value):
 		self.value = value
 		self.set_pos()
@@ -525,6 +1092,8 @@ class Number:
 #=====================================#
 
 class Context:
+	__slots__ = ('display_name', 'parent', 'parent_entry_pos', 'symbol_table')
+
 	def __init__(self, display_name, parent=None, parent_entry_pos=None):
 		self.display_name = display_name
 		self.parent = parent
@@ -537,15 +1106,17 @@ class Context:
 #          SYMBOL TABLE           #
 # ===============================#    
 class SymbolTable:
-	def __init__(self):
+	def __init__(self, parent=None):
 		self.symbols = {}
-		self.parent = None
+		self.parent = parent
 
 	def get(self, name):
-		value = self.symbols.get(name, None)
-		if value == None and self.parent:
-			return self.parent.get(name)
-		return value
+		table = self
+		while table:
+			value = table.symbols.get(name)
+			if value is not None: return value
+			table = table.parent
+		return None
 
 	def set(self, name, value):
 		self.symbols[name] = value
@@ -553,6 +1124,42 @@ class SymbolTable:
 	def remove(self, name):
 		del self.symbols[name]
 
+	# A new table with this one's bindings, shared through a frozen layer, not copied
+	def fork(self):
+		if self.symbols:
+			# Readers see the bindings through one table or the other throughout
+			self.parent = FrozenSymbolTable(self.symbols, self.parent)
+			self.symbols = {}
+		return SymbolTable(self.parent)
+
+# Frozen layers a lookup may walk through before fork() merges them
+MAX_FROZEN_LAYERS = 16
+
+# Read-only layer under forked tables and every Engine's base; owns the dict given
+class FrozenSymbolTable(SymbolTable):
+	def __init__(self, symbols, parent=None):
+		self.symbols = symbols
+		self.parent = parent
+		self.depth = parent.depth + 1 if isinstance(parent, FrozenSymbolTable) else 1
+
+		if self.depth > MAX_FROZEN_LAYERS:
+			layers = []
+			table = self
+			while isinstance(table, FrozenSymbolTable):
+				layers.append(table.symbols)
+				table = table.parent
+			self.symbols = {}
+			for symbols in reversed(layers):
+				self.symbols.update(symbols)
+			self.parent = table
+			self.depth = 1
+
+	def set(self, name, value):
+		raise Exception(f"Cannot assign '{name}' in a frozen symbol table")
+
+	def remove(self, name):
+		raise Exception(f"Cannot remove '{name}' from a frozen symbol table")
+
 
 
 #======================================#
@@ -580,7 +1187,7 @@ class Interpreter:
 		var_name = node.var_name_tok.value
 		value = context.symbol_table.get(var_name)
 
-		if not value:
+		if value is None:
 			return res.failure(RTError(
 				node.pos_start, node.pos_end,
 				f"'{var_name}' is not defined",
@@ -622,6 +1229,13 @@ class Interpreter:
 		else:
 			return res.success(result.set_pos(node.pos_start, node.pos_end))
 
+	def visit_ProgramNode(self, node, context):
+		res = RTResult()
+		for statement in node.statements:
+			value = res.register(self.visit(statement, context))
+			if res.error: return res
+		return res.success(value)
+
 	def visit_UnaryOpNode(self, node, context):
 		res = RTResult()
 		number = res.register(self.visit(node.node, context))
@@ -637,31 +1251,1848 @@ class Interpreter:
 		else:
 			return res.success(number.set_pos(node.pos_start, node.pos_end))
 
-    
+# Interpreter returning Numbers and raising Failure instead of building RTResults
+class FastInterpreter(Interpreter):
+	def __init__(self):
+		self.methods = {
+			cls: getattr(self, f'visit_{cls.__name__}')
+			for cls in (NumberNode, VarAccessNode, VarAssignNode, BinOpNode, UnaryOpNode, ProgramNode)
+		}
+
+	def visit(self, node, context):
+		method = self.methods.get(type(node))
+		if method is None: return self.no_visit_method(node, context)
+		return method(node, context)
+
+	###################################
+
+	def visit_NumberNode(self, node, context):
+		return Number(node.tok.value).set_context(context).set_pos(node.pos_start, node.pos_end)
+
+	def visit_VarAccessNode(self, node, context):
+		var_name = node.var_name_tok.value
+		value = context.symbol_table.get(var_name)
+
+		if value is None:
+			raise Failure(RTError(
+				node.pos_start, node.pos_end,
+				f"'{var_name}' is not defined",
+				context
+			))
+
+		return value.copy().set_pos(node.pos_start, node.pos_end)
+
+	def visit_VarAssignNode(self, node, context):
+		value = self.visit(node.value_node, context)
+		context.symbol_table.set(node.var_name_tok.value, value)
+		return value
+
+	def visit_BinOpNode(self, node, context):
+		left = self.visit(node.left_node, context)
+		right = self.visit(node.right_node, context)
+		op = node.op_tok.type
+
+		if op == TT_PLUS:
+			value = left.value + right.value
+		elif op == TT_MINUS:
+			value = left.value - right.value
+		elif op == TT_MUL:
+			value = left.value * right.value
+		elif op == TT_DIV:
+			if right.value == 0:
+				raise Failure(RTError(
+					right.pos_start, right.pos_end,
+					'Division by zero',
+					left.context
+				))
+			value = left.value / right.value
+		else:
+			value = left.value ** right.value
+
+		return Number(value).set_context(left.context).set_pos(node.pos_start, node.pos_end)
+
+	def visit_ProgramNode(self, node, context):
+		for statement in node.statements:
+			value = self.visit(statement, context)
+		return value
+
+	def visit_UnaryOpNode(self, node, context):
+		number = self.visit(node.node, context)
+
+		if node.op_tok.type == TT_MINUS:
+			number = Number(number.value * -1).set_context(number.context)
+		return number.set_pos(node.pos_start, node.pos_end)
+
+# FastInterpreter over raw ints and floats; exec_unboxed wraps the final value
+class UnboxedInterpreter(FastInterpreter):
+	def visit_NumberNode(self, node, context):
+		return node.tok.value
+
+	def visit_VarAccessNode(self, node, context):
+		var_name = node.var_name_tok.value
+		value = context.symbol_table.get(var_name)
+
+		if value is None:
+			raise Failure(RTError(
+				node.pos_start, node.pos_end,
+				f"'{var_name}' is not defined",
+				context
+			))
+
+		return value.value
+
+	def visit_VarAssignNode(self, node, context):
+		value = self.visit(node.value_node, context)
+		context.symbol_table.set(node.var_name_tok.value, Number(value).set_context(context))
+		return value
+
+	def visit_BinOpNode(self, node, context):
+		left = self.visit(node.left_node, context)
+		right = self.visit(node.right_node, context)
+		op = node.op_tok.type
+
+		if op == TT_PLUS:
+			return left + right
+		if op == TT_MINUS:
+			return left - right
+		if op == TT_MUL:
+			return left * right
+		if op == TT_DIV:
+			if right == 0:
+				pos_node = value_pos_node(node.right_node)
+				raise Failure(RTError(
+					pos_node.pos_start, pos_node.pos_end,
+					'Division by zero',
+					context
+				))
+			return left / right
+		return left ** right
+
+	def visit_UnaryOpNode(self, node, context):
+		value = self.visit(node.node, context)
+
+		if node.op_tok.type == TT_MINUS:
+			return value * -1
+		return value
+
+#======================================#
+#         PROFILER                     #
+#======================================#
+
+class NodeStats:
+	__slots__ = ('count', 'time', 'self_time', 'numbers')
+
+	def __init__(self):
+		self.count = 0
+		# time includes the node's children, self_time does not; numbers
+		# counts the Number objects the node itself created
+		self.time = 0.0
+		self.self_time = 0.0
+		self.numbers = 0
+
+	def as_dict(self):
+		return {'count': self.count, 'time': self.time, 'self_time': self.self_time, 'numbers': self.numbers}
+
+class NodeLocation(NodeStats, Span):
+	__slots__ = ('node_type', 'src', 'start', 'end', 'frame')
+
+	def __init__(self, node_type, node):
+		super().__init__()
+		self.node_type = node_type
+		self.src = node.src
+		self.start = node.start
+		self.end = node.end
+		ln, col = self.src.line_col(self.start)
+		# Frame name in collapsed stacks; ';' separates frames there
+		self.frame = f'{node_type} {self.src.fn}:{ln + 1}:{col + 1}'.replace(';', ',')
+
+	def as_dict(self):
+		pos_start, pos_end = self.pos_start, self.pos_end
+		return dict(
+			super().as_dict(), type=self.node_type, fn=pos_start.fn,
+			line=pos_start.ln + 1, col=pos_start.col + 1, end_line=pos_end.ln + 1, end_col=pos_end.col + 1
+		)
+
+class NumberCounter(threading.local):
+	# None while the thread is not profiling
+	count = None
+
+number_counter = NumberCounter()
+number_counting_lock = threading.Lock()
+number_counting_users = 0
+plain_number_init = Number.__init__
+
+def counting_number_init(self, value):
+	if number_counter.count is not None: number_counter.count += 1
+	plain_number_init(self, value)
+
+# Counts this thread's new Numbers; Number.__init__ only counts inside this block
+@contextmanager
+def counting_numbers():
+	global number_counting_users
+	with number_counting_lock:
+		number_counting_users += 1
+		Number.__init__ = counting_number_init
+	saved = number_counter.count
+	number_counter.count = saved or 0
+	try:
+		yield number_counter
+	finally:
+		if saved is not None: saved = number_counter.count
+		number_counter.count = saved
+		with number_counting_lock:
+			number_counting_users -= 1
+			if not number_counting_users: Number.__init__ = plain_number_init
+
+# Phase timings, Numbers created, and NodeStats by node class and position for
+# tree runs, summed over every run given this Profile; one Profile per thread
+class Profile:
+	def __init__(self):
+		self.runs = 0
+		self.phases = {}
+		self.numbers = 0
+		self.types = {}
+		self.positions = {}
+		# Stack of frames -> self seconds of its innermost node
+		self.stacks = {}
+
+	def add_phase(self, name, seconds):
+		self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+	def location(self, node_type, node):
+		src = node.src
+		key = (node_type, src.fn, src.text, src.first_line, node.start, node.end)
+		location = self.positions.get(key)
+		if location is None:
+			location = self.positions[key] = NodeLocation(node_type, node)
+		return location
+
+	# Timed phases of a profiled Engine.run; a cache miss skips the disk cache
+	# so lexing and parsing can be timed
+	def load(self, fn, text, lexer, parser, cache):
+		clock = time.perf_counter
+		self.runs += 1
+
+		program = None
+		if cache:
+			start = clock()
+			program = program_cache.get(fn, text)
+			self.add_phase('cache', clock() - start)
+		if program is None:
+			program = parse_program(fn, text, lexer, parser, program_cache.hashcons, self)
+			if cache: program_cache.put(program)
+		return program
+
+	def executable(self, program, engine, optimize):
+		clock = time.perf_counter
+		if optimize:
+			start = clock()
+			program.get_node(True)
+			self.add_phase('optimize', clock() - start)
+
+		start = clock()
+		code = program.executable(engine, optimize)
+		self.add_phase('compile', clock() - start)
+		return code
+
+	def execute(self, code, context, engine, execute):
+		with counting_numbers() as counter:
+			start = time.perf_counter()
+			if engine == 'tree':
+				result = ProfilingInterpreter(self).visit(code, context)
+			else:
+				result = execute(code, context)
+			self.add_phase('execute', time.perf_counter() - start)
+			self.numbers += counter.count
+		return result
+
+	def as_dict(self):
+		positions = sorted(self.positions.values(), key=lambda location: location.time, reverse=True)
+		return {
+			'runs': self.runs,
+			'phases': dict(self.phases),
+			'numbers': self.numbers,
+			'types': {name: stats.as_dict() for name, stats in self.types.items()},
+			'positions': [location.as_dict() for location in positions],
+		}
+
+	# Collapsed stacks for flamegraph tools, self time in microseconds
+	def collapsed(self):
+		lines = []
+		node_time = sum(self.stacks.values())
+		for phase, seconds in self.phases.items():
+			if phase == 'execute': seconds = max(seconds - node_time, 0.0)
+			lines.append(f'{phase} {round(seconds * 1e6)}')
+		for frames, seconds in self.stacks.items():
+			lines.append(f'execute;{";".join(frames)} {round(seconds * 1e6)}')
+		return '\n'.join(lines) + '\n'
+
+	def write_collapsed(self, path):
+		with open(path, 'w') as f:
+			f.write(self.collapsed())
+
+# Interpreter that records NodeStats for each visited node into a Profile
+class ProfilingInterpreter(Interpreter):
+	def __init__(self, profile):
+		self.profile = profile
+		self.frames = []
+		# [child seconds, child Numbers] of each node being visited
+		self.children = [[0.0, 0]]
+		# Nesting depth by node class, so a class's time counts recursion once
+		self.active = {}
+
+	def visit(self, node, context):
+		profile = self.profile
+		node_type = type(node).__name__
+		location = profile.location(node_type, node)
+		stats = profile.types.get(node_type)
+		if stats is None: stats = profile.types[node_type] = NodeStats()
+
+		self.frames.append(location.frame)
+		depth = self.active.get(node_type, 0)
+		self.active[node_type] = depth + 1
+		self.children.append([0.0, 0])
+		numbers = number_counter.count
+		start = time.perf_counter()
+
+		result = super().visit(node, context)
+
+		elapsed = time.perf_counter() - start
+		created = number_counter.count - numbers
+		child_time, child_numbers = self.children.pop()
+		parent = self.children[-1]
+		parent[0] += elapsed
+		parent[1] += created
+		self.active[node_type] = depth
+
+		self_time = elapsed - child_time
+		own_numbers = created - child_numbers
+		for record in (location, stats):
+			record.count += 1
+			record.self_time += self_time
+			record.numbers += own_numbers
+		location.time += elapsed
+		if not depth: stats.time += elapsed
+
+		frames = tuple(self.frames)
+		profile.stacks[frames] = profile.stacks.get(frames, 0.0) + self_time
+		self.frames.pop()
+		return result
+
+#======================================#
+#         BUDGETS                      #
+#======================================#
+
+# Steps between two looks at the clock
+DEADLINE_CHECK_INTERVAL = 64
+
+# Limits for one run, each None for none: max_steps (nodes or instructions),
+# timeout in seconds, max_int_bits for '*' and '^'; going over raises a BudgetError
+class Budget:
+	def __init__(self, max_steps=None, timeout=None, max_int_bits=None):
+		self.max_steps = max_steps
+		self.timeout = timeout
+		self.max_int_bits = max_int_bits
+
+def int_bits(op, left, right, limit):
+	# Bit length of left * right or left ** right, or a bound on it enough to
+	# compare with limit; 0 when the result is not an int
+	if type(left) is not int or type(right) is not int: return 0
+	if op == TT_MUL:
+		if not left or not right: return 0
+		low = left.bit_length() + right.bit_length() - 1
+		high = low + 1
+	else:
+		if right < 0: return 0
+		base = abs(left)
+		if base < 2: return 1
+		low = (base.bit_length() - 1) * right + 1
+		high = base.bit_length() * right
+
+	if low > limit: return low
+	if high <= limit: return high
+	if op == TT_MUL: return (left * right).bit_length()
+	return int(right * math.log2(base)) + 1
+
+class Meter:
+	__slots__ = ('budget', 'steps', 'deadline')
+
+	# Tracks one run against its Budget
+	def __init__(self, budget):
+		self.budget = budget
+		self.steps = 0
+		self.deadline = None if budget.timeout is None else time.monotonic() + budget.timeout
+
+	def step(self, node, context):
+		# Counts one step; returns a BudgetError once a limit is passed
+		self.steps += 1
+		budget = self.budget
+		if budget.max_steps is not None and self.steps > budget.max_steps:
+			return BudgetError(
+				node.pos_start, node.pos_end,
+				f'Step limit of {budget.max_steps} exceeded',
+				context
+			)
+		if self.deadline is not None and self.steps % DEADLINE_CHECK_INTERVAL == 1 and time.monotonic() > self.deadline:
+			return BudgetError(
+				node.pos_start, node.pos_end,
+				f'Time limit of {budget.timeout}s exceeded',
+				context
+			)
+		return None
+
+	def vm_step(self, code, pc, op, stack, context):
+		# VM step hook: counts the instruction and guards BINARY_MUL and BINARY_POW
+		node = code.nodes[pc]
+		error = self.step(node, context)
+		if error: return error
+		if op == OP_BINARY_MUL: return self.check_int(TT_MUL, stack[-2], stack[-1], node, context)
+		if op == OP_BINARY_POW: return self.check_int(TT_POW, stack[-2], stack[-1], node, context)
+		return None
+
+	def check_int(self, op, left, right, node, context):
+		limit = self.budget.max_int_bits
+		if limit is None: return None
+		bits = int_bits(op, left, right, limit)
+		if bits <= limit: return None
+		return BudgetError(
+			node.pos_start, node.pos_end,
+			f'Result would have at least {bits} bits, more than the limit of {limit}',
+			context
+		)
+
+# Interpreter that counts each node as a Meter step and guards '*' and '^'
+class BudgetInterpreter(Interpreter):
+	def __init__(self, meter):
+		self.meter = meter
+
+	def visit(self, node, context):
+		error = self.meter.step(node, context)
+		if error: return RTResult().failure(error)
+		return super().visit(node, context)
+
+	def visit_BinOpNode(self, node, context):
+		op = node.op_tok.type
+		if op != TT_MUL and op != TT_POW:
+			return super().visit_BinOpNode(node, context)
+
+		res = RTResult()
+		left = res.register(self.visit(node.left_node, context))
+		if res.error: return res
+		right = res.register(self.visit(node.right_node, context))
+		if res.error: return res
+
+		error = self.meter.check_int(op, left.value, right.value, node, context)
+		if error: return res.failure(error)
+
+		if op == TT_MUL:
+			result, error = left.multed_by(right)
+		else:
+			result, error = left.powed_by(right)
+
+		if error:
+			return res.failure(error)
+		else:
+			return res.success(result.set_pos(node.pos_start, node.pos_end))
+
+#======================================#
+#      COMMON SUBEXPRESSIONS           #
+#======================================#
+
+# Rebuilds an AST as a DAG with identical pure subexpressions shared; with
+# keep_spans, nodes whose errors could report a later occurrence stay unshared
+class HashConser:
+	def __init__(self, keep_spans=False):
+		self.keep_spans = keep_spans
+		# Structural key -> node; keys hold the ids of interned children
+		self.nodes = {}
+		# Interned node -> names it reads, and how many parents it has
+		self.reads = {}
+		self.uses = {}
+		self.shared = {}
+		self.canonical = {}
+		self.reused = 0
+
+	def build(self, node):
+		node, _ = self.visit(node)
+		self.shared = {
+			node: self.reads[node]
+			for node, uses in self.uses.items()
+			if uses > 1 and not isinstance(node, (NumberNode, VarAccessNode))
+		}
+		return node
+
+	# Returns the node to use and the names it reads, or None for a node
+	# that was not interned, such as one that assigns
+	def visit(self, node):
+		method_name = f'visit_{type(node).__name__}'
+		method = getattr(self, method_name, self.no_visit_method)
+		result = method(node)
+		self.canonical[node] = result[0]
+		return result
+
+	def no_visit_method(self, node):
+		raise Exception(f'No visit_{type(node).__name__} method defined')
+
+	def intern(self, key, node, reads, children=()):
+		interned = self.nodes.get(key)
+		if interned is None:
+			self.nodes[key] = node
+			self.reads[node] = reads
+			self.uses[node] = 1
+			return node, reads
+
+		# The duplicate's children were counted as its parents' children
+		for child in children:
+			self.uses[child] -= 1
+		self.uses[interned] += 1
+		self.reused += 1
+		return interned, self.reads[interned]
+
+	###################################
+
+	def visit_NumberNode(self, node):
+		tok = node.tok
+		return self.intern((NumberNode, tok.type, repr(tok.value)), node, frozenset())
+
+	def visit_VarAccessNode(self, node):
+		name = node.var_name_tok.value
+		return self.intern((VarAccessNode, name), node, frozenset((name,)))
+
+	def visit_VarAssignNode(self, node):
+		value_node, _ = self.visit(node.value_node)
+		if value_node is not node.value_node:
+			node = respan(VarAssignNode(node.var_name_tok, value_node), node)
+		return node, None
+
+	def visit_BinOpNode(self, node):
+		left, left_reads = self.visit(node.left_node)
+		right, right_reads = self.visit(node.right_node)
+		# A division by zero reports its divisor's span, so each gets a node of its own
+		divides = self.keep_spans and node.op_tok.type == TT_DIV
+		divisor = self.unshared(right, node.right_node) if divides else right
+		if left is not node.left_node or divisor is not node.right_node:
+			node = respan(BinOpNode(left, node.op_tok, divisor), node)
+		if left_reads is None or right_reads is None: return node, None
+		# A divisor that reads variables may be zero at a later occurrence only
+		if divides and right_reads: return node, None
+
+		key = (BinOpNode, node.op_tok.type, id(left), id(right))
+		return self.intern(key, node, left_reads | right_reads, (left, right))
+
+	def visit_UnaryOpNode(self, node):
+		operand, reads = self.visit(node.node)
+		if operand is not node.node:
+			node = respan(UnaryOpNode(node.op_tok, operand), node)
+		if reads is None: return node, None
+
+		key = (UnaryOpNode, node.op_tok.type, id(operand))
+		return self.intern(key, node, reads, (operand,))
+
+	def unshared(self, interned, node):
+		# A node of this occurrence's own, over the same interned children; an
+		# assignment's value has the span of the value node it assigns
+		if type(interned) is VarAssignNode:
+			return respan(VarAssignNode(interned.var_name_tok, self.unshared(interned.value_node, node.value_node)), node)
+		if type(interned) is BinOpNode:
+			return respan(BinOpNode(interned.left_node, interned.op_tok, interned.right_node), node)
+		if type(interned) is UnaryOpNode:
+			return respan(UnaryOpNode(interned.op_tok, interned.node), node)
+		return node
+
+	def visit_ProgramNode(self, node):
+		statements = [self.visit(statement)[0] for statement in node.statements]
+		if any(new is not old for new, old in zip(statements, node.statements)):
+			node = respan(ProgramNode(statements), node)
+		return node, None
+
+# Walks the original AST, evaluating each shared subexpression once per run until
+# a VAR assigns one of the names it reads
+class CSEInterpreter(Interpreter):
+	def __init__(self, occurrences):
+		self.occurrences = occurrences
+		# DAG node -> its value, never handed out itself, since callers set_pos
+		self.values = {}
+		# Name -> shared nodes with a value that read it
+		self.dependents = {}
+
+	def visit(self, node, context):
+		occurrence = self.occurrences.get(node)
+		if occurrence is None: return super().visit(node, context)
+
+		shared, reads = occurrence
+		value = self.values.get(shared)
+		if value is not None:
+			return RTResult().success(value.copy().set_pos(node.pos_start, node.pos_end))
+
+		res = super().visit(node, context)
+		if res.error: return res
+		self.values[shared] = res.value.copy()
+		for name in reads:
+			self.dependents.setdefault(name, []).append(shared)
+		return res
+
+	def visit_VarAssignNode(self, node, context):
+		res = super().visit_VarAssignNode(node, context)
+		if res.error: return res
+
+		for dependent in self.dependents.pop(node.var_name_tok.value, ()):
+			self.values.pop(dependent, None)
+		return res
+
+#======================================#
+#         RESOLVER                     #
+#======================================#
+
+# Slot value of a variable that is not bound yet
+MISSING = object()
+
+class Scope:
+	__slots__ = ('names', 'slots')
+
+	def __init__(self):
+		self.names = []
+		self.slots = {}
+
+	def slot(self, name):
+		index = self.slots.get(name)
+		if index is None:
+			index = self.slots[name] = len(self.names)
+			self.names.append(name)
+		return index
+
+# Gives every variable name a fixed slot in the program's single scope
+class Resolver:
+	def resolve(self, node):
+		scope = Scope()
+		stack = [node]
+		while stack:
+			node = stack.pop()
+			cls = type(node)
+			if cls is BinOpNode:
+				stack.append(node.right_node)
+				stack.append(node.left_node)
+			elif cls is UnaryOpNode:
+				stack.append(node.node)
+			elif cls is VarAccessNode:
+				scope.slot(node.var_name_tok.value)
+			elif cls is VarAssignNode:
+				scope.slot(node.var_name_tok.value)
+				stack.append(node.value_node)
+			elif cls is ProgramNode:
+				stack.extend(reversed(node.statements))
+		return scope
+
+def bind_slots(names, symbol_table):
+	slots = [MISSING] * len(names)
+	for index, name in enumerate(names):
+		value = symbol_table.get(name)
+		if value is not None: slots[index] = value.value
+	return slots
+
+#======================================#
+#         BYTECODE                     #
+#======================================#
+
+OP_LOAD_CONST	= 0
+OP_LOAD_SLOT	= 1
+OP_STORE_SLOT	= 2
+OP_BINARY_ADD	= 3
+OP_BINARY_SUB	= 4
+OP_BINARY_MUL	= 5
+OP_BINARY_DIV	= 6
+OP_BINARY_POW	= 7
+OP_UNARY_NEG	= 8
+OP_POP_TOP	= 9
+
+OP_NAMES = [
+	'LOAD_CONST', 'LOAD_SLOT', 'STORE_SLOT',
+	'BINARY_ADD', 'BINARY_SUB', 'BINARY_MUL', 'BINARY_DIV', 'BINARY_POW',
+	'UNARY_NEG', 'POP_TOP'
+]
+
+BINARY_OPS = {
+	TT_PLUS: OP_BINARY_ADD,
+	TT_MINUS: OP_BINARY_SUB,
+	TT_MUL: OP_BINARY_MUL,
+	TT_DIV: OP_BINARY_DIV,
+	TT_POW: OP_BINARY_POW,
+}
+
+class Code:
+	def __init__(self, node, names=()):
+		self.instructions = []
+		# Variable names by slot index, the arguments of LOAD_SLOT and STORE_SLOT
+		self.names = list(names)
+		# Node whose span an instruction reports in an RTError
+		self.nodes = []
+		# The value left on the stack carries the position of the root node
+		self.node = node
+
+	def emit(self, op, arg, node):
+		self.instructions.append((op, arg))
+		self.nodes.append(node)
+
+	def __repr__(self):
+		return '\n'.join(
+			f'{i:4} {OP_NAMES[op]:<12} {self.format_arg(op, arg)}'
+			for i, (op, arg) in enumerate(self.instructions)
+		)
+
+	def format_arg(self, op, arg):
+		if arg is None: return ''
+		if op == OP_LOAD_SLOT or op == OP_STORE_SLOT: return f'{arg} ({self.names[arg]})'
+		return repr(arg)
+
+
+#======================================#
+#         COMPILER                     #
+#======================================#
+
+class Compiler:
+	def compile(self, node):
+		self.scope = Resolver().resolve(node)
+		code = Code(result_node(node), self.scope.names)
+		self.visit(node, code)
+		return code
+
+	def visit(self, node, code):
+		method_name = f'visit_{type(node).__name__}'
+		method = getattr(self, method_name, self.no_visit_method)
+		return method(node, code)
+
+	def no_visit_method(self, node, code):
+		raise Exception(f'No visit_{type(node).__name__} method defined')
+
+	###################################
+
+	def visit_NumberNode(self, node, code):
+		code.emit(OP_LOAD_CONST, node.tok.value, node)
+
+	def visit_VarAccessNode(self, node, code):
+		code.emit(OP_LOAD_SLOT, self.scope.slots[node.var_name_tok.value], node)
+
+	def visit_VarAssignNode(self, node, code):
+		self.visit(node.value_node, code)
+		code.emit(OP_STORE_SLOT, self.scope.slots[node.var_name_tok.value], node)
+
+	def visit_BinOpNode(self, node, code):
+		self.visit(node.left_node, code)
+		self.visit(node.right_node, code)
+
+		# 'Division by zero' points at the divisor, like Number.dived_by
+		pos_node = node
+		if node.op_tok.type == TT_DIV:
+			pos_node = value_pos_node(node.right_node)
+
+		code.emit(BINARY_OPS[node.op_tok.type], None, pos_node)
+
+	def visit_UnaryOpNode(self, node, code):
+		self.visit(node.node, code)
+
+		if node.op_tok.type == TT_MINUS:
+			code.emit(OP_UNARY_NEG, None, node)
+
+	def visit_ProgramNode(self, node, code):
+		# Only the last statement's value stays on the stack
+		for statement in node.statements[:-1]:
+			self.visit(statement, code)
+			code.emit(OP_POP_TOP, None, statement)
+		self.visit(node.statements[-1], code)
+
+def result_node(node):
+	# A program evaluates to its last statement, which gives the result its position
+	if isinstance(node, ProgramNode): return node.statements[-1]
+	return node
+
+def value_pos_node(node):
+	# An assignment evaluates to its value, which keeps the position of the value node
+	while isinstance(node, VarAssignNode):
+		node = node.value_node
+	return node
+
+
+#======================================#
+#         VIRTUAL MACHINE              #
+#======================================#
+
+# Returned by a VM step hook to stop the run where it can be resumed
+PAUSE = object()
+
+class Paused:
+	__slots__ = ('code', 'context', 'pc', 'stack', 'slots')
+
+	# A run stopped by PAUSE before instruction pc; VM.resume continues it
+	def __init__(self, code, context, pc, stack, slots):
+		self.code = code
+		self.context = context
+		self.pc = pc
+		self.stack = stack
+		self.slots = slots
+
+# Runs Code; the step hook may return an Error to fail the run or PAUSE to return
+# a Paused run that resume() continues
+class VM:
+	def __init__(self, step=None):
+		self.step = step
+
+	def run(self, code, context):
+		return self.execute(code, context, 0, [], bind_slots(code.names, context.symbol_table))
+
+	def resume(self, paused):
+		return self.execute(paused.code, paused.context, paused.pc, paused.stack, paused.slots)
+
+	def execute(self, code, context, start, stack, slots):
+		res = RTResult()
+		step = self.step
+		symbol_table = context.symbol_table
+		names = code.names
+		push = stack.append
+		pop = stack.pop
+
+		instructions = code.instructions
+		if start: instructions = islice(instructions, start, None)
+		for pc, (op, arg) in enumerate(instructions, start):
+			if step is not None:
+				signal = step(code, pc, op, stack, context)
+				if signal is not None:
+					if signal is PAUSE: return Paused(code, context, pc, stack, slots)
+					return res.failure(signal)
+
+			if op == OP_LOAD_CONST:
+				push(arg)
+			elif op == OP_LOAD_SLOT:
+				value = slots[arg]
+				if value is MISSING:
+					node = code.nodes[pc]
+					return res.failure(RTError(
+						node.pos_start, node.pos_end,
+						f"'{names[arg]}' is not defined",
+						context
+					))
+				push(value)
+			elif op == OP_BINARY_ADD:
+				right = pop()
+				stack[-1] = stack[-1] + right
+			elif op == OP_BINARY_MUL:
+				right = pop()
+				stack[-1] = stack[-1] * right
+			elif op == OP_BINARY_SUB:
+				right = pop()
+				stack[-1] = stack[-1] - right
+			elif op == OP_BINARY_DIV:
+				right = pop()
+				if right == 0:
+					node = code.nodes[pc]
+					return res.failure(RTError(
+						node.pos_start, node.pos_end,
+						'Division by zero',
+						context
+					))
+				stack[-1] = stack[-1] / right
+			elif op == OP_BINARY_POW:
+				right = pop()
+				stack[-1] = stack[-1] ** right
+			elif op == OP_UNARY_NEG:
+				stack[-1] = stack[-1] * -1
+			elif op == OP_POP_TOP:
+				pop()
+			elif op == OP_STORE_SLOT:
+				slots[arg] = stack[-1]
+				symbol_table.set(names[arg], Number(stack[-1]).set_context(context))
+
+		return res.success(
+			Number(stack[-1]).set_context(context).set_pos(code.node.pos_start, code.node.pos_end)
+		)
+
+
+#======================================#
+#         PYTHON COMPILER              #
+#======================================#
+
+class CompiledFailure(Exception):
+	def __init__(self, index):
+		self.index = index
+
+# Compiles an AST to a Python function with one local per slot and intermediate value
+class PyCompiler:
+	def compile(self, node):
+		self.lines = []
+		self.temps = 0
+		self.failures = []
+		self.consts = {}
+		self.scope = Resolver().resolve(node)
+		for index, name in enumerate(self.scope.names):
+			self.lines.append(f's{index} = get({name!r})')
+			self.lines.append(f'if s{index} is not None: s{index} = s{index}.value')
+		result = self.visit(node)
+
+		source = 'def formula(get, set, context):\n'
+		source += ''.join(f'\t{line}\n' for line in self.lines)
+		source += f'\treturn {result}\n'
+
+		namespace = {'Number': Number, 'CompiledFailure': CompiledFailure}
+		namespace.update(self.consts)
+		exec(compile(source, f'<minilang {node.src.fn}>', 'exec'), namespace)
+		return PyCode(namespace['formula'], self.failures, result_node(node), source)
+
+	def temp(self, expr):
+		name = f't{self.temps}'
+		self.temps += 1
+		self.lines.append(f'{name} = {expr}')
+		return name
+
+	def guard(self, condition, node, details):
+		self.lines.append(f'if {condition}: raise CompiledFailure({len(self.failures)})')
+		self.failures.append((node, details))
+
+	def visit(self, node):
+		method_name = f'visit_{type(node).__name__}'
+		method = getattr(self, method_name, self.no_visit_method)
+		return method(node)
+
+	def no_visit_method(self, node):
+		raise Exception(f'No visit_{type(node).__name__} method defined')
+
+	###################################
+
+	def visit_NumberNode(self, node):
+		value = node.tok.value
+		if isinstance(value, int) or (isinstance(value, float) and value - value == 0):
+			# A folded negative constant needs parentheses: -2 ** x is -(2 ** x)
+			literal = repr(value)
+			return f'({literal})' if literal.startswith('-') else literal
+
+		# inf and nan from folded constants have no literal form
+		name = f'k{len(self.consts)}'
+		self.consts[name] = value
+		return name
+
+	def visit_VarAccessNode(self, node):
+		var_name = node.var_name_tok.value
+		slot = f's{self.scope.slots[var_name]}'
+		self.guard(f'{slot} is None', node, f"'{var_name}' is not defined")
+		# A later assignment may rebind the slot before this value is used
+		return self.temp(slot)
+
+	def visit_VarAssignNode(self, node):
+		var_name = node.var_name_tok.value
+		value = self.visit(node.value_node)
+		self.lines.append(f's{self.scope.slots[var_name]} = {value}')
+		self.lines.append(f'set({var_name!r}, Number({value}).set_context(context))')
+		return value
+
+	def visit_BinOpNode(self, node):
+		left = self.visit(node.left_node)
+		right = self.visit(node.right_node)
+		op = node.op_tok.type
+
+		if op == TT_DIV:
+			self.guard(f'{right} == 0', value_pos_node(node.right_node), 'Division by zero')
+
+		symbol = {TT_PLUS: '+', TT_MINUS: '-', TT_MUL: '*', TT_DIV: '/', TT_POW: '**'}[op]
+		return self.temp(f'{left} {symbol} {right}')
+
+	def visit_ProgramNode(self, node):
+		for statement in node.statements:
+			# Temporaries never outlive their statement, so names are reused
+			self.temps = 0
+			value = self.visit(statement)
+		return value
+
+	def visit_UnaryOpNode(self, node):
+		value = self.visit(node.node)
+		if node.op_tok.type == TT_MINUS:
+			return self.temp(f'{value} * -1')
+		return value
+
+class PyCode:
+	def __init__(self, func, failures, node, source):
+		self.func = func
+		self.failures = failures
+		self.node = node
+		self.source = source
+
+	def run(self, context):
+		res = RTResult()
+		symbol_table = context.symbol_table
+
+		try:
+			value = self.func(symbol_table.get, symbol_table.set, context)
+		except CompiledFailure as failure:
+			node, details = self.failures[failure.index]
+			return res.failure(RTError(node.pos_start, node.pos_end, details, context))
+
+		return res.success(
+			Number(value).set_context(context).set_pos(self.node.pos_start, self.node.pos_end)
+		)
+
+
+#======================================#
+#         PROGRAM CACHE                #
+#======================================#
+
+class Program:
+	__slots__ = ('fn', 'text', 'node', 'error', 'optimized', 'eliminated', 'compiled', 'size', 'cache')
+
+	def __init__(self, fn, text, node=None, error=None):
+		self.fn = fn
+		self.text = text
+		self.node = node
+		self.error = error
+		self.optimized = None
+		self.eliminated = 0
+		# (engine, optimize) -> executable form built by that engine
+		self.compiled = {}
+		self.size = sys.getsizeof(text) + (sizeof_tree(node) if node else sys.getsizeof(error))
+		# The ProgramCache that last stored this program, which counts its size
+		self.cache = None
+
+	def grow(self, size):
+		# Counts a form attached after parsing, in the cache's byte total too
+		if self.cache is None:
+			self.size += size
+		else:
+			self.cache.grow(self, size)
+
+	def set_optimized(self, node, eliminated):
+		self.optimized = node
+		self.eliminated = eliminated
+		if node is not self.node: self.grow(sizeof_tree(node))
+
+	def get_node(self, optimize):
+		if not optimize: return self.node
+		if self.optimized is None:
+			optimizer = Optimizer()
+			self.set_optimized(optimizer.optimize(self.node), optimizer.eliminated)
+		return self.optimized
+
+	def executable(self, engine, optimize):
+		key = (engine, optimize)
+		code = self.compiled.get(key)
+		if code is None:
+			built = ENGINES[engine][0](self.get_node(optimize))
+			# Of two threads building the same form, the first one stored is kept
+			code = self.compiled.setdefault(key, built)
+			if code is built:
+				if isinstance(code, TieredCode): code.program = self
+				self.grow(sizeof_code(code))
+		return code
+
+def sizeof_tree(node):
+	# Nodes shared by a hash-consed tree are counted once
+	size = 0
+	seen = set()
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if id(node) in seen: continue
+		seen.add(id(node))
+		size += sys.getsizeof(node)
+		for attr in ('tok', 'var_name_tok', 'op_tok'):
+			tok = getattr(node, attr, None)
+			if tok is not None: size += sys.getsizeof(tok) + sys.getsizeof(tok.value)
+		for attr in ('left_node', 'right_node', 'node', 'value_node'):
+			child = getattr(node, attr, None)
+			if child is not None: stack.append(child)
+		if isinstance(node, ProgramNode):
+			size += sys.getsizeof(node.statements)
+			stack.extend(node.statements)
+	return size
+
+def sizeof_code(code):
+	# Bytes an executable form holds beyond the AST it was built from
+	if isinstance(code, Code):
+		return (
+			sys.getsizeof(code) + sys.getsizeof(code.instructions) + sys.getsizeof(code.nodes)
+			+ sys.getsizeof(code.names) + sum(sys.getsizeof(instruction) for instruction in code.instructions)
+		)
+	if isinstance(code, PyCode):
+		func = code.func
+		return (
+			sys.getsizeof(code) + sys.getsizeof(code.source) + sys.getsizeof(code.failures)
+			+ sys.getsizeof(func) + sys.getsizeof(func.__code__) + sys.getsizeof(func.__globals__)
+		)
+	if isinstance(code, TieredCode):
+		# Its compiled form is counted when the program is promoted
+		return sys.getsizeof(code)
+	if isinstance(code, tuple):
+		# The 'cse' engine's map of occurrences of shared subexpressions
+		node, occurrences = code
+		return sys.getsizeof(code) + sys.getsizeof(occurrences) + sum(sys.getsizeof(entry) for entry in occurrences.values())
+	# The tree engines run the program's own AST
+	return 0
+
+def parse_program(fn, text, lexer='regex', parser='pratt', hashcons=False, profile=None):
+	if lexer == 'regex' and parser == 'pratt' and profile is None:
+		node, error = stream_parse(RegexLexer(fn, text))
+	else:
+		node, error = parse_tokens(fn, text, lexer, parser, profile)
+	if error: return Program(fn, text, error=error)
+	if hashcons: return Program(fn, text, node=HashConser(keep_spans=True).build(node))
+	return Program(fn, text, node=node)
+
+def parse_tokens(fn, text, lexer, parser, profile):
+	# Lexes to a full token list first; with a Profile, both phases are timed into it
+	clock = time.perf_counter
+	start = clock()
+	tokens, error = LEXERS[lexer](fn, text).make_tokens()
+	if profile is not None: profile.add_phase('lex', clock() - start)
+	if error: return None, error
+
+	start = clock()
+	ast = PARSERS[parser](tokens).parse()
+	if profile is not None: profile.add_phase('parse', clock() - start)
+	return ast.node, ast.error
+
+# Thread-safe LRU of parsed Programs by (fn, text), failed ones included, bounded
+# by entries and bytes; optionally backed by a DiskCache and hash-consed
+class ProgramCache:
+	def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024, disk=None, hashcons=False):
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.disk = disk
+		self.hashcons = hashcons
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, fn, text):
+		key = (fn, text)
+		with self.lock:
+			program = self.entries.get(key)
+			if program is None:
+				self.misses += 1
+				return None
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return program
+
+	def load(self, fn, text, lexer='regex', optimize=False, parser='pratt'):
+		program = self.get(fn, text)
+		if program is not None: return program
+
+		program = self.disk.load(fn, text) if self.disk else None
+		if program is None:
+			program = parse_program(fn, text, lexer, parser, self.hashcons)
+			if self.disk:
+				if optimize and not program.error: program.get_node(True)
+				try:
+					self.disk.store(program)
+				except OSError:
+					pass
+		return self.put(program)
+
+	def put(self, program):
+		key = (program.fn, program.text)
+		with self.lock:
+			old = self.entries.pop(key, None)
+			if old is not None: self.bytes -= old.size
+			if program.size > self.max_bytes: return program
+
+			self.entries[key] = program
+			self.bytes += program.size
+			program.cache = self
+			self.shrink()
+		return program
+
+	def grow(self, program, size):
+		# Program.grow: a cached program got an optimized or executable form
+		with self.lock:
+			program.size += size
+			key = (program.fn, program.text)
+			if self.entries.get(key) is not program: return
+
+			self.bytes += size
+			if program.size > self.max_bytes:
+				del self.entries[key]
+				self.bytes -= program.size
+				self.evictions += 1
+			self.shrink()
+
+	def shrink(self):
+		# Evicts least recently used programs until within both limits; holds the lock
+		while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+			_, evicted = self.entries.popitem(last=False)
+			self.bytes -= evicted.size
+			self.evictions += 1
+
+	def invalidate(self, fn=None, text=None):
+		# No arguments clears the cache; fn alone drops every program of that file
+		with self.lock:
+			if fn is None and text is None:
+				keys = list(self.entries)
+			elif text is None:
+				keys = [key for key in self.entries if key[0] == fn]
+			else:
+				keys = [(fn, text)] if (fn, text) in self.entries else []
+
+			for key in keys:
+				self.bytes -= self.entries.pop(key).size
+			return len(keys)
+
+	def stats(self):
+		with self.lock:
+			return {
+				'entries': len(self.entries),
+				'bytes': self.bytes,
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+			}
+
+
+#======================================#
+#         DISK CACHE                   #
+#======================================#
+
+# Bump when the encoding of tokens, nodes or errors below changes
+DISK_CACHE_MAGIC = b'MLC\0'
+DISK_CACHE_VERSION = 2
+DISK_CACHE_HEADER = DISK_CACHE_MAGIC + DISK_CACHE_VERSION.to_bytes(4, 'little')
+
+NODE_CODES = {
+	'NumberNode': 0,
+	'VarAccessNode': 1,
+	'VarAssignNode': 2,
+	'BinOpNode': 3,
+	'UnaryOpNode': 4,
+	'ProgramNode': 5,
+}
+
+ERROR_CLASSES = {
+	'IllegalCharError': IllegalCharError,
+	'ExpectedCharError': ExpectedCharError,
+	'InvalidSyntaxError': InvalidSyntaxError,
+}
+
+def encode_token(tok):
+	return (tok.type, tok.value, tok.start, tok.end)
+
+def decode_token(data, src):
+	tok = Token(data[0], data[1])
+	tok.src = src
+	tok.start = data[2]
+	tok.end = data[3]
+	return tok
+
+# Nodes carry their own span: the optimizer may widen it past their tokens
+def encode_node(node):
+	code = NODE_CODES[type(node).__name__]
+	if code == 0: fields = (encode_token(node.tok),)
+	elif code == 1: fields = (encode_token(node.var_name_tok),)
+	elif code == 2: fields = (encode_token(node.var_name_tok), encode_node(node.value_node))
+	elif code == 3: fields = (encode_node(node.left_node), encode_token(node.op_tok), encode_node(node.right_node))
+	elif code == 4: fields = (encode_token(node.op_tok), encode_node(node.node))
+	else: fields = tuple(encode_node(statement) for statement in node.statements)
+	return (code, node.start, node.end) + fields
+
+def decode_node(data, src):
+	code = data[0]
+	if code == 0: node = NumberNode(decode_token(data[3], src))
+	elif code == 1: node = VarAccessNode(decode_token(data[3], src))
+	elif code == 2: node = VarAssignNode(decode_token(data[3], src), decode_node(data[4], src))
+	elif code == 3: node = BinOpNode(decode_node(data[3], src), decode_token(data[4], src), decode_node(data[5], src))
+	elif code == 4: node = UnaryOpNode(decode_token(data[3], src), decode_node(data[4], src))
+	else: node = ProgramNode([decode_node(statement, src) for statement in data[3:]])
+	node.start = data[1]
+	node.end = data[2]
+	return node
+
+def encode_program(program):
+	if program.error:
+		error = program.error
+		return ('E', type(error).__name__, error.pos_start.idx, error.pos_end.idx, error.details)
+
+	optimized = None
+	if program.optimized is not None:
+		optimized = (encode_node(program.optimized), program.eliminated)
+	return ('N', encode_node(program.node), optimized)
+
+def decode_program(fn, text, body):
+	src = Source(fn, text)
+	if body[0] == 'E':
+		_, name, start, end, details = body
+		return Program(fn, text, error=ERROR_CLASSES[name](Position(start, src), Position(end, src), details))
+
+	program = Program(fn, text, node=decode_node(body[1], src))
+	if body[2] is not None:
+		optimized, eliminated = body[2]
+		program.set_optimized(decode_node(optimized, src), eliminated)
+	return program
+
+def read_cache_file(path):
+	with open(path, 'rb') as f:
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			if mm[:len(DISK_CACHE_HEADER)] != DISK_CACHE_HEADER: return None
+			with memoryview(mm) as view:
+				return marshal.loads(view[len(DISK_CACHE_HEADER):])
+
+def write_cache_file(path, data):
+	tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+	with open(tmp, 'wb') as f:
+		f.write(DISK_CACHE_HEADER)
+		f.write(marshal.dumps(data))
+	os.replace(tmp, path)
+
+# Parsed programs on disk, one marshal file per (fn, text) or one pack per library,
+# rebuilt into nodes without lexing or parsing
+class DiskCache:
+	def __init__(self, directory):
+		self.directory = directory
+		self.packed = {}
+		os.makedirs(directory, exist_ok=True)
+
+	def path(self, fn, text):
+		digest = hashlib.sha256(fn.encode() + b'\0' + text.encode()).hexdigest()
+		return os.path.join(self.directory, digest[:32] + '.mlc')
+
+	def store(self, program):
+		write_cache_file(self.path(program.fn, program.text), (program.fn, program.text, encode_program(program)))
+
+	def load(self, fn, text):
+		body = self.packed.get((fn, text))
+		if body is not None: return decode_program(fn, text, body)
+
+		try:
+			data = read_cache_file(self.path(fn, text))
+		except (OSError, ValueError, EOFError, TypeError):
+			return None
+
+		# Guards against hash collisions and stale formats
+		if data is None or data[0] != fn or data[1] != text: return None
+		return decode_program(fn, text, data[2])
+
+	def save_pack(self, programs, name='library'):
+		path = os.path.join(self.directory, name + '.mlp')
+		write_cache_file(path, [(p.fn, p.text, encode_program(p)) for p in programs])
+
+	def open_pack(self, name='library'):
+		try:
+			data = read_cache_file(os.path.join(self.directory, name + '.mlp'))
+		except (OSError, ValueError, EOFError, TypeError):
+			return 0
+		if data is None: return 0
+
+		for fn, text, body in data:
+			self.packed[(fn, text)] = body
+		return len(data)
+
+	def clear(self):
+		self.packed.clear()
+		for name in os.listdir(self.directory):
+			if name.endswith(('.mlc', '.mlp')):
+				os.remove(os.path.join(self.directory, name))
+
+
+#===================================================#
+#                 Tiered execution                  #
+#===================================================#
+
+# Runs of one program before the 'tiered' engine compiles it, unless an
+# Engine is given its own tier_threshold
+TIER_THRESHOLD = 1000
+# Compiled runs between two timed ones
+TIER_SAMPLE_INTERVAL = 16
+
+tier_pool = None
+tier_pool_lock = threading.Lock()
+
+def get_tier_pool():
+	global tier_pool
+	with tier_pool_lock:
+		if tier_pool is None:
+			tier_pool = ThreadPoolExecutor(1, thread_name_prefix='tier')
+		return tier_pool
+
+# Runs on the Interpreter until a program reaches its threshold, then on the
+# PyCompiler form compiled in the background
+class TieredCode:
+	__slots__ = (
+		'node', 'tier', 'runs', 'code', 'lock', 'program',
+		'tree_runs', 'tree_time', 'compiled_runs', 'timed_runs', 'timed_time', 'compile_time'
+	)
+
+	def __init__(self, node):
+		self.node = node
+		# 'tree', then 'compiling' and 'compiled', or 'failed' if compiling raised
+		self.tier = 'tree'
+		self.runs = 0
+		self.code = None
+		self.lock = threading.Lock()
+		# Set by Program.executable, so the compiled form adds to its size
+		self.program = None
+		self.tree_runs = 0
+		self.tree_time = 0.0
+		self.compiled_runs = 0
+		self.timed_runs = 0
+		self.timed_time = 0.0
+		self.compile_time = 0.0
+
+	def run(self, context, threshold=TIER_THRESHOLD):
+		# Counters are updated under the lock, the runs themselves outside it
+		with self.lock:
+			self.runs += 1
+			code = self.code
+			if code is not None:
+				self.compiled_runs += 1
+				timed = not self.compiled_runs % TIER_SAMPLE_INTERVAL
+			else:
+				promote = self.runs >= threshold and self.tier == 'tree'
+				if promote: self.tier = 'compiling'
+
+		if code is not None:
+			if not timed: return code.run(context)
+			start = time.perf_counter()
+			result = code.run(context)
+			elapsed = time.perf_counter() - start
+			with self.lock:
+				self.timed_time += elapsed
+				self.timed_runs += 1
+			return result
+
+		if promote: get_tier_pool().submit(self.compile)
+		start = time.perf_counter()
+		result = Interpreter().visit(self.node, context)
+		elapsed = time.perf_counter() - start
+		with self.lock:
+			self.tree_time += elapsed
+			self.tree_runs += 1
+		return result
+
+	def compile(self):
+		start = time.perf_counter()
+		try:
+			code = PyCompiler().compile(self.node)
+		except Exception:
+			self.tier = 'failed'
+			return
+		self.compile_time = time.perf_counter() - start
+		self.code = code
+		self.tier = 'compiled'
+		if self.program is not None: self.program.grow(sizeof_code(code))
+
+	# saved is the compiled runs' time saved over tree runs, less compile time
+	def stats(self):
+		tree_mean = self.tree_time / self.tree_runs if self.tree_runs else None
+		compiled_mean = self.timed_time / self.timed_runs if self.timed_runs else None
+		saved = None
+		if tree_mean is not None and compiled_mean is not None:
+			saved = self.compiled_runs * (tree_mean - compiled_mean) - self.compile_time
+		return {
+			'tier': self.tier,
+			'runs': self.runs,
+			'tree_runs': self.tree_runs,
+			'compiled_runs': self.compiled_runs,
+			'tree_mean': tree_mean,
+			'compiled_mean': compiled_mean,
+			'compile_time': self.compile_time,
+			'saved': saved,
+		}
+
+# TieredCode.stats() with fn, text and optimize for each tiered program in the cache
+def tier_stats(cache=None):
+	cache = program_cache if cache is None else cache
+	with cache.lock:
+		programs = list(cache.entries.values())
+
+	stats = []
+	for program in programs:
+		for (engine, optimize), code in list(program.compiled.items()):
+			if engine != 'tiered': continue
+			stats.append(dict(code.stats(), fn=program.fn, text=program.text, optimize=optimize))
+	return stats
+
+
 #===================================================#
 #                        Run                        #
 #===================================================#
 
-global_symbol_table = SymbolTable()
-global_symbol_table.set("null", Number(0))
+# Bindings every Engine's sessions start from unless given their own base
+base_symbol_table = FrozenSymbolTable({'null': Number(0)})
+
+global_symbol_table = SymbolTable(base_symbol_table)
+
+program_cache = ProgramCache()
+
+def compile_tree(node):
+	return node
+
+def exec_tree(node, context):
+	return Interpreter().visit(node, context)
+
+# Keeps no state between visits, so one instance serves every thread
+fast_interpreter = FastInterpreter()
+
+def compile_fast(node):
+	return node
+
+def exec_fast(node, context):
+	try:
+		return RTResult().success(fast_interpreter.visit(node, context))
+	except Failure as failure:
+		return RTResult().failure(failure.error)
+
+unboxed_interpreter = UnboxedInterpreter()
+
+def exec_unboxed(node, context):
+	try:
+		value = unboxed_interpreter.visit(node, context)
+	except Failure as failure:
+		return RTResult().failure(failure.error)
+	return RTResult().success(Number(value).set_context(context).set_pos(node.pos_start, node.pos_end))
+
+def compile_vm(node):
+	return Compiler().compile(node)
+
+def exec_vm(code, context):
+	return VM().run(code, context)
+
+def exec_tree_budget(node, context, budget):
+	return BudgetInterpreter(Meter(budget)).visit(node, context)
+
+def exec_vm_budget(code, context, budget):
+	return VM(Meter(budget).vm_step).run(code, context)
+
+def compile_cse(node):
+	conser = HashConser()
+	conser.build(node)
+	shared = conser.shared
+	occurrences = {
+		occurrence: (interned, shared[interned])
+		for occurrence, interned in conser.canonical.items()
+		if interned in shared
+	}
+	return node, occurrences
+
+def exec_cse(code, context):
+	node, occurrences = code
+	return CSEInterpreter(occurrences).visit(node, context)
+
+def compile_tiered(node):
+	return TieredCode(node)
+
+def exec_tiered(code, context, threshold=TIER_THRESHOLD):
+	return code.run(context, threshold)
+
+def compile_python(node):
+	return PyCompiler().compile(node)
+
+def exec_python(code, context):
+	return code.run(context)
+
+# Each engine turns an AST into its executable form once, then runs that
+# form against a context.
+ENGINES = {
+	'tree': (compile_tree, exec_tree),
+	'fast': (compile_fast, exec_fast),
+	'unboxed': (compile_fast, exec_unboxed),
+	'vm': (compile_vm, exec_vm),
+	'python': (compile_python, exec_python),
+	'cse': (compile_cse, exec_cse),
+	'tiered': (compile_tiered, exec_tiered),
+}
+
+# Engines that can run under a Budget, with the same executable forms
+BUDGET_ENGINES = {
+	'tree': exec_tree_budget,
+	'vm': exec_vm_budget,
+}
+
+LEXERS = {
+	'char': Lexer,
+	'regex': RegexLexer,
+}
+
+# Both parsers build the same trees and report the same errors
+PARSERS = {
+	'recursive': Parser,
+	'pratt': PrattParser,
+}
+
+# Run settings and the frozen base environment its sessions start from; base may be
+# a dict of bindings; holds no other state, so threads can share one
+class Engine:
+	def __init__(self, engine='vm', lexer='regex', parser='pratt', optimize=False, cache=True, base=None, tier_threshold=None):
+		if engine not in ENGINES:
+			raise Exception(f"Unknown engine '{engine}'")
+		if lexer not in LEXERS:
+			raise Exception(f"Unknown lexer '{lexer}'")
+		if parser not in PARSERS:
+			raise Exception(f"Unknown parser '{parser}'")
+		if tier_threshold is None:
+			tier_threshold = TIER_THRESHOLD
+		elif tier_threshold < 1:
+			raise Exception('tier_threshold must be at least 1')
+
+		self.engine = engine
+		self.lexer = lexer
+		self.parser = parser
+		self.optimize = optimize
+		self.cache = cache
+		if base is None:
+			base = base_symbol_table
+		elif not isinstance(base, FrozenSymbolTable):
+			base = FrozenSymbolTable(make_bindings(base), base_symbol_table)
+		self.base = base
+		# Runs of a program before the 'tiered' engine compiles it
+		self.tier_threshold = tier_threshold
+
+	def session(self, bindings=None):
+		symbol_table = SymbolTable(self.base)
+		symbol_table.symbols.update(make_bindings(bindings or {}))
+		return Session(self, symbol_table)
+
+	def run(self, fn, text, symbol_table, budget=None, profile=None):
+		engine = self.engine
+		if budget is not None:
+			if engine not in BUDGET_ENGINES:
+				raise Exception(f"Engine '{engine}' does not support budgets")
+			if profile is not None:
+				raise Exception('A profiled run cannot have a budget')
+
+		# Generate tokens and AST, or reuse them
+		if profile is not None:
+			program = profile.load(fn, text, self.lexer, self.parser, self.cache)
+		elif self.cache:
+			program = program_cache.load(fn, text, self.lexer, self.optimize, self.parser)
+		else:
+			program = parse_program(fn, text, self.lexer, self.parser)
+		if program.error: return None, program.error
 
-def run(fn, text):
-	# Generate tokens
-	lexer = Lexer(fn, text)
-	tokens, error = lexer.make_tokens()
-	if error: return None, error
-	
-	# Generate AST
-	parser = Parser(tokens)
-	ast = parser.parse()
-	if ast.error: return None, ast.error
+		# Simplify AST and build the engine's executable form
+		if profile is not None:
+			code = profile.executable(program, engine, self.optimize)
+		else:
+			code = program.executable(engine, self.optimize)
+		if self.optimize: record_optimized(program)
+
+		# Run program; timings and node statistics go to a Profile only when one is given
+		context = Context('<program>')
+		context.symbol_table = symbol_table
+		if profile is not None:
+			result = profile.execute(code, context, engine, self.execute)
+		elif budget is None:
+			result = self.execute(code, context)
+		else:
+			result = BUDGET_ENGINES[engine](code, context, budget)
+
+		return result.value, result.error
+
+	def execute(self, code, context):
+		if self.engine == 'tiered': return exec_tiered(code, context, self.tier_threshold)
+		return ENGINES[self.engine][1](code, context)
+
+# One tenant's variables over its Engine's base; fork() copies them in O(1)
+class Session:
+	def __init__(self, engine, symbol_table):
+		self.engine = engine
+		self.symbol_table = symbol_table
+		self.lock = threading.Lock()
+
+	def run(self, fn, text, budget=None, profile=None):
+		with self.lock:
+			return self.engine.run(fn, text, self.symbol_table, budget, profile)
+
+	def fork(self):
+		with self.lock:
+			return Session(self.engine, self.symbol_table.fork())
+
+	def get(self, name):
+		value = self.symbol_table.get(name)
+		return None if value is None else value.value
+
+	def set(self, name, value):
+		with self.lock:
+			self.symbol_table.set(name, value if isinstance(value, Number) else Number(value))
+
+def make_bindings(bindings):
+	return {name: value if isinstance(value, Number) else Number(value) for name, value in bindings.items()}
+
+# One Engine per combination of run() settings
+shared_engines = {}
+
+def run(fn, text, engine='vm', lexer='regex', optimize=False, cache=True, symbol_table=None, parser='pratt', profile=None, budget=None):
+	key = (engine, lexer, parser, optimize, cache)
+	runner = shared_engines.get(key)
+	if runner is None:
+		runner = shared_engines[key] = Engine(engine, lexer, parser, optimize, cache)
+	return runner.run(fn, text, global_symbol_table if symbol_table is None else symbol_table, budget, profile)
+
+# Yields (value, error) for each statement of a program as it is parsed and run;
+# stops after the first error
+def run_program(fn, text, engine='vm', optimize=False, symbol_table=None):
+	compile_, execute = ENGINES[engine]
+	context = Context('<program>')
+	context.symbol_table = global_symbol_table if symbol_table is None else symbol_table
+
+	lexer = RegexLexer(fn, text)
+	parser = StreamParser(lexer.iter_tokens())
+	while True:
+		try:
+			node = parser.next_statement()
+		except Failure as failure:
+			yield None, lexer.error or failure.error
+			return
+
+		# The lexer only stops early at an illegal character, which then
+		# cut this statement short
+		if lexer.error:
+			yield None, lexer.error
+			return
+		if node is None: return
+
+		if optimize: node = Optimizer().optimize(node)
+		result = execute(compile_(node), context)
+		yield result.value, result.error
+		if result.error: return
 
-	# Run program
-	interpreter = Interpreter()
+#===================================================#
+#                     Streaming                     #
+#===================================================#
+
+STATEMENT_RE = re.compile(r'[^;]+')
+COMMENT_RE = re.compile(r'//|/\*')
+
+# Blanks out a line's comments; also returns None, -1 for a '/*' left open from
+# an earlier line, or the column of a '/*' this line leaves open
+def strip_comments(line, in_comment=False):
+	if not in_comment and '/' not in line: return line, None
+
+	parts = []
+	pos = 0
+	opened = -1
+	while True:
+		if in_comment:
+			end = line.find('*/', pos)
+			if end == -1:
+				parts.append(' ' * (len(line) - pos))
+				return ''.join(parts), opened
+			parts.append(' ' * (end + 2 - pos))
+			pos = end + 2
+			in_comment = False
+
+		m = COMMENT_RE.search(line, pos)
+		if m is None:
+			parts.append(line[pos:])
+			return ''.join(parts), None
+
+		parts.append(line[pos:m.start()])
+		if m.group() == '//':
+			parts.append(' ' * (len(line) - m.start()))
+			return ''.join(parts), None
+
+		parts.append('  ')
+		pos = opened = m.start()
+		pos += 2
+		in_comment = True
+
+def iter_statements(fn, lines):
+	# Statements end at a newline or ';' and are lexed from the line with comments
+	# blanked out; each line's Source keeps it as written for error messages
+	opened = None
+	for ln, line in enumerate(lines):
+		line = line.rstrip('\n')
+		code, col = strip_comments(line, opened is not None)
+		if col is None: opened = None
+		elif col >= 0: opened = (ln, line, col)
+
+		src = None
+		for m in STATEMENT_RE.finditer(code):
+			if not m.group().strip(' \t'): continue
+			if src is None: src = Source(fn, line, ln)
+			yield src, code, m.start(), m.end()
+
+	# An unclosed '/*' is lexed on its own to report the error
+	if opened is not None:
+		ln, line, col = opened
+		yield Source(fn, line, ln), line, col, col + 2
+
+def parse_statement(src, code, start, end):
+	return stream_parse(RegexLexer(src.fn, code, start, end, src))
+
+# Like run_program, but over an iterable of lines, such as an open file
+def run_stream(fn, lines, engine='vm', optimize=False, symbol_table=None):
+	compile_, execute = ENGINES[engine]
 	context = Context('<program>')
-	context.symbol_table = global_symbol_table
-	result = interpreter.visit(ast.node, context)
+	context.symbol_table = global_symbol_table if symbol_table is None else symbol_table
 
-	return result.value, result.error
+	for src, code, start, end in iter_statements(fn, lines):
+		node, error = parse_statement(src, code, start, end)
+		if error:
+			yield None, error
+			return
+
+		if optimize: node = Optimizer().optimize(node)
+		result = execute(compile_(node), context)
+		yield result.value, result.error
+		if result.error: return
+
+#===================================================#
+#                       Batch                       #
+#===================================================#
+
+# Executors are kept per (mode, workers) so repeated batches reuse warm
+# workers and their program caches.
+batch_pools = {}
+batch_pools_lock = threading.Lock()
+
+def get_pool(mode, workers):
+	key = (mode, workers)
+	with batch_pools_lock:
+		pool = batch_pools.get(key)
+		if pool is None:
+			if mode == 'thread':
+				pool = ThreadPoolExecutor(workers)
+			elif mode == 'process':
+				pool = ProcessPoolExecutor(workers)
+			else:
+				raise Exception(f"Unknown mode '{mode}'")
+			batch_pools[key] = pool
+		return pool
+
+def shutdown_pools():
+	with batch_pools_lock:
+		for pool in batch_pools.values():
+			pool.shutdown()
+		batch_pools.clear()
+
+def make_symbol_table(bindings=None):
+	symbol_table = SymbolTable(base_symbol_table)
+	symbol_table.symbols.update(make_bindings(bindings or {}))
+	return symbol_table
+
+def run_isolated(fn, text, bindings=None, engine='vm', optimize=False):
+	return run(fn, text, engine, optimize=optimize, symbol_table=make_symbol_table(bindings))
+
+def run_chunk(fn, tasks, engine, optimize):
+	return [run_isolated(fn, text, bindings, engine, optimize) for text, bindings in tasks]
+
+# Yields (value, error) in input order for programs run on a thread or process pool,
+# each with its own SymbolTable; bindings is one dict or one per program
+def run_many(programs, bindings=None, workers=None, mode='thread', fn='<batch>', engine='vm', optimize=False):
+	# Checked here rather than in the generator, so bad arguments raise on the call
+	if engine not in ENGINES:
+		raise Exception(f"Unknown engine '{engine}'")
+	programs = list(programs)
+	if bindings is None or isinstance(bindings, dict):
+		tasks = [(text, bindings) for text in programs]
+	else:
+		bindings = list(bindings)
+		if len(bindings) != len(programs):
+			raise Exception(f'Expected one bindings dict per program, got {len(bindings)} for {len(programs)} programs')
+		tasks = list(zip(programs, bindings))
+
+	workers = workers or os.cpu_count() or 1
+	return run_tasks(get_pool(mode, workers), tasks, workers, mode, fn, engine, optimize)
+
+def run_tasks(pool, tasks, workers, mode, fn, engine, optimize):
+	# Processes get chunks of tasks so pickling is paid per chunk, not per formula
+	size = 1 if mode == 'thread' else max(1, min(256, len(tasks) // (workers * 4)))
+	chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+	for results in pool.map(run_chunk, [fn] * len(chunks), chunks, [engine] * len(chunks), [optimize] * len(chunks)):
+		yield from results
 
-    
@@ -1,7 +1,39 @@
+import sys
 import main
-while True:
-    text=input('basic >')
-    result,error=main.run('<stdin>',text)
-    if  error:
-        print(error.as_string())
-    else:print(result)
\ No newline at end of file
+
+def run_file(fn, file, out=sys.stdout):
+    # Runs a script in this process, streaming it line by line from an open
+    # file. Statement results are written in large blocks rather than one
+    # print per statement; the first error goes to stderr and ends the run.
+    lines = []
+    for result, error in main.run_stream(fn, file):
+        if error:
+            out.write(''.join(line + '\n' for line in lines))
+            out.flush()
+            print(error.as_string(), file=sys.stderr)
+            return 1
+        lines.append(str(result))
+        if len(lines) >= 4096:
+            out.write(''.join(line + '\n' for line in lines))
+            lines.clear()
+    out.write(''.join(line + '\n' for line in lines))
+    return 0
+
+def repl():
+    while True:
+        text=input('basic >')
+        result,error=main.run('<stdin>',text)
+        if  error:
+            print(error.as_string())
+        else:print(result)
+
+if __name__ == '__main__':
+    # shell.py FILE runs a script, shell.py - or a pipe runs stdin, and a
+    # terminal gets the prompt
+    if len(sys.argv) > 1 and sys.argv[1] != '-':
+        with open(sys.argv[1]) as f:
+            sys.exit(run_file(sys.argv[1], f))
+    elif len(sys.argv) > 1 or not sys.stdin.isatty():
+        sys.exit(run_file('<stdin>', sys.stdin))
+    else:
+        repl()
@@ -7,8 +7,8 @@ The function then constructs a string with the relevant lines from the text and
 """
 def string_with_arrows(text,pos_start,pos_end):
     result=''
-    idx_start=max(text.rfind('\n',0,pos_start.idx),0)
-    idx_end=text.find('\n',idx_start+1)
+    idx_start=text.rfind('\n',0,pos_start.idx)+1
+    idx_end=text.find('\n',idx_start)
 
     if idx_end <0 :idx_end=len(text)
 
@@ -21,8 +21,8 @@ def string_with_arrows(text,pos_start,pos_end):
         result+=line+'\n'
         result+=' '*col_start+'^'*(col_end-col_start)
 
-        idx_start=idx_end
-        idx_end=text.find('\n',idx_start+1)
+        idx_start=idx_end+1
+        idx_end=text.find('\n',idx_start)
         if idx_end<0 :idx_end=len(text)
 
     return result.replace('\t','')
\ No newline at end of file